@@ -31,6 +31,13 @@ def _float(x):
         return None
 
 
+def _levels_payload(levels: list, levels_format: str):
+    if levels_format == "arrow":
+        # Stored as parquet list<struct<price, size>> so readers can skip JSON decoding.
+        return [{"price": _float(row[0]), "size": _float(row[1])} for row in levels]
+    return json.dumps(levels, ensure_ascii=False)
+
+
 def _parse_bids_asks(data, bid_key="bids", ask_key="asks"):
     bids = data.get(bid_key) if isinstance(data, dict) else None
     asks = data.get(ask_key) if isinstance(data, dict) else None
@@ -149,7 +156,7 @@ def fetch_upbit_spot(market: str, depth: int) -> tuple[list, list]:
     return bids, asks
 
 
-async def _collect_ws(depth: int, interval_sec: float, out_dir: Path) -> None:
+async def _collect_ws(depth: int, interval_sec: float, out_dir: Path, levels_format: str = "json") -> None:
     book_writer = RollingParquetWriter(out_dir, "zil_orderbook", window_sec=300)
     oi_writer = RollingParquetWriter(out_dir, "zil_open_interest", window_sec=300)
 
@@ -223,8 +230,8 @@ async def _collect_ws(depth: int, interval_sec: float, out_dir: Path) -> None:
                                     "market": mkt,
                                     "symbol": symbols["BINANCE"][mkt],
                                     "depth": depth,
-                                    "bids": json.dumps(bids, ensure_ascii=False),
-                                    "asks": json.dumps(asks, ensure_ascii=False),
+                                    "bids": _levels_payload(bids, levels_format),
+                                    "asks": _levels_payload(asks, levels_format),
                                 }
                             )
                 except Exception:
@@ -266,8 +273,8 @@ async def _collect_ws(depth: int, interval_sec: float, out_dir: Path) -> None:
                                     "market": market,
                                     "symbol": symbol,
                                     "depth": depth,
-                                    "bids": json.dumps(bids, ensure_ascii=False),
-                                    "asks": json.dumps(asks, ensure_ascii=False),
+                                    "bids": _levels_payload(bids, levels_format),
+                                    "asks": _levels_payload(asks, levels_format),
                                 }
                             )
                 except Exception:
@@ -309,8 +316,8 @@ async def _collect_ws(depth: int, interval_sec: float, out_dir: Path) -> None:
                                 "market": "spot",
                                 "symbol": symbols["UPBIT"]["spot"],
                                 "depth": depth,
-                                "bids": json.dumps(bids, ensure_ascii=False),
-                                "asks": json.dumps(asks, ensure_ascii=False),
+                                "bids": _levels_payload(bids, levels_format),
+                                "asks": _levels_payload(asks, levels_format),
                             }
                         )
             except Exception:
@@ -330,11 +337,18 @@ def main() -> None:
     ap.add_argument("--interval-sec", type=float, default=1.0)
     ap.add_argument("--out-dir", default="src/out/zil_books_oi")
     ap.add_argument("--mode", choices=["poll", "ws"], default="poll")
+    ap.add_argument(
+        "--levels-format",
+        choices=["json", "arrow"],
+        default="json",
+        help="bids/asks column encoding; arrow writes list<struct<price,size>> instead of JSON strings",
+    )
     args = ap.parse_args()
+    levels_format = args.levels_format
 
     out_dir = Path(args.out_dir)
     if args.mode == "ws":
-        asyncio.run(_collect_ws(args.depth, args.interval_sec, out_dir))
+        asyncio.run(_collect_ws(args.depth, args.interval_sec, out_dir, levels_format))
         return
 
     book_writer = RollingParquetWriter(out_dir, "zil_orderbook", window_sec=300)
@@ -373,8 +387,8 @@ def main() -> None:
                         "market": "spot",
                         "symbol": sym["spot"],
                         "depth": args.depth,
-                        "bids": json.dumps(bids, ensure_ascii=False),
-                        "asks": json.dumps(asks, ensure_ascii=False),
+                        "bids": _levels_payload(bids, levels_format),
+                        "asks": _levels_payload(asks, levels_format),
                     }
                 )
             except Exception as exc:
@@ -391,8 +405,8 @@ def main() -> None:
                             "market": "perp",
                             "symbol": sym["perp"],
                             "depth": args.depth,
-                            "bids": json.dumps(bids, ensure_ascii=False),
-                            "asks": json.dumps(asks, ensure_ascii=False),
+                            "bids": _levels_payload(bids, levels_format),
+                            "asks": _levels_payload(asks, levels_format),
                         }
                     )
                     oi_writer.write(
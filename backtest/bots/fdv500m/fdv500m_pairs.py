@@ -29,24 +29,57 @@ from __future__ import annotations
 
 import argparse
 import os
+import re
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 FDV_LIMIT_USD = 500_000_000
 COINGECKO_BASE = "https://api.coingecko.com/api/v3"
+CG_CACHE_DIR = Path.home() / ".cache" / "fdv500m"
+# /coins/markets returns ~30 fields per coin; only these are ever used.
+CG_MARKET_COLUMNS = ["id", "name", "symbol", "market_cap", "fully_diluted_valuation"]
+CG_CACHE_COLUMNS = ["id", "name", "symbol", "symbol_u", "market_cap", "fdv_usd"]
+
+BINANCE_QUOTES = sorted(
+    [
+        "USDT", "USDC", "FDUSD", "BUSD", "TUSD",
+        "BTC", "ETH", "BNB",
+        "EUR", "GBP", "TRY", "BRL", "AUD", "JPY", "KRW", "INR",
+        "BIDR", "IDRT", "UAH", "ZAR", "ARS", "MXN", "PLN", "RUB", "NGN",
+    ],
+    key=len,
+    reverse=True,
+)
+# Anchored suffix match; the lookbehind keeps a non-empty base. The leftmost match is the
+# longest matching quote, same as the previous long-first endswith loop.
+BINANCE_QUOTE_RE = re.compile(r"(?<=.)(?:" + "|".join(map(re.escape, BINANCE_QUOTES)) + r")$")
 
 
 # ------------------------- HTTP helpers -------------------------
 
-def http_get_json(url: str, params: Optional[dict] = None, timeout: int = 30) -> Any:
-    """GET JSON with retries for 429/5xx."""
-    headers = {
+# One pooled session for the whole run: every call after the first to a host reuses its
+# TCP/TLS connection instead of paying a fresh handshake.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=0))
+SESSION.headers.update(
+    {
         "Accept": "application/json",
         "User-Agent": "fdv500m-pairs/1.0",
     }
+)
+
+
+def http_get_json(url: str, params: Optional[dict] = None, timeout: int = 30) -> Any:
+    """GET JSON with retries for 429/5xx."""
+    headers = {}
     if "api.coingecko.com" in url:
         key = os.getenv("COINGECKO_DEMO_API_KEY")
         if key:
@@ -55,9 +88,9 @@ def http_get_json(url: str, params: Optional[dict] = None, timeout: int = 30) ->
     backoff = 2
     last_err: Optional[str] = None
     for _ in range(8):
-        r = requests.get(url, params=params, headers=headers, timeout=timeout)
+        r = SESSION.get(url, params=params, headers=headers, timeout=timeout)
         if r.status_code == 200:
-            return r.json()
+            return orjson.loads(r.content)
         if r.status_code in (429, 500, 502, 503, 504):
             last_err = f"{r.status_code} {r.text[:160]}"
             time.sleep(backoff)
@@ -69,61 +102,109 @@ def http_get_json(url: str, params: Optional[dict] = None, timeout: int = 30) ->
 
 # ------------------------- CoinGecko FDV -------------------------
 
-def fetch_coingecko_markets(max_pages: int = 40, per_page: int = 250) -> pd.DataFrame:
-    rows: List[dict] = []
-    for page in range(1, max_pages + 1):
-        print(f"[CoinGecko] fetching markets page {page}/{max_pages} ...")
-        data = http_get_json(
-            f"{COINGECKO_BASE}/coins/markets",
-            params={
-                "vs_currency": "usd",
-                "order": "market_cap_desc",
-                "per_page": per_page,
-                "page": page,
-                "sparkline": "false",
-            },
-        )
-        if not isinstance(data, list) or not data:
-            print(f"[CoinGecko] no data at page {page}; stopping.")
-            break
-        rows.extend(data)
-        print(f"[CoinGecko] page {page} rows: {len(data)} | total: {len(rows)}")
-        time.sleep(0.25)
-    df = pd.DataFrame(rows)
+def _fetch_coingecko_page(page: int, max_pages: int, per_page: int) -> Any:
+    print(f"[CoinGecko] fetching markets page {page}/{max_pages} ...")
+    return http_get_json(
+        f"{COINGECKO_BASE}/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "order": "market_cap_desc",
+            "per_page": per_page,
+            "page": page,
+            "sparkline": "false",
+        },
+    )
+
+
+def fetch_coingecko_markets(
+    max_pages: int = 40,
+    per_page: int = 250,
+    workers: int = 4,
+    cache_ttl: Optional[float] = None,
+) -> pd.DataFrame:
+    """Fetch CoinGecko markets; with cache_ttl (seconds), reuse a recent on-disk copy."""
+    cache_path = CG_CACHE_DIR / f"cg_markets_{max_pages}x{per_page}.parquet"
+    if cache_ttl is not None and cache_path.exists():
+        age = time.time() - cache_path.stat().st_mtime
+        if age <= cache_ttl:
+            print(f"[CoinGecko] using cached markets {cache_path} (age {age:.0f}s)")
+            return pd.read_parquet(cache_path)
+
+    frames: List[pd.DataFrame] = []
+    n_rows = 0
+    # Pages are fetched in waves of `workers`; http_get_json's 429 backoff does the throttling.
+    # Pages are consumed in order, so the first empty page still ends the listing.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(1, max_pages + 1, workers):
+            pages = range(start, min(start + workers, max_pages + 1))
+            wave = dict(zip(pages, pool.map(lambda pg: _fetch_coingecko_page(pg, max_pages, per_page), pages)))
+            done = False
+            for page in pages:
+                data = wave[page]
+                if not isinstance(data, list) or not data:
+                    print(f"[CoinGecko] no data at page {page}; stopping.")
+                    done = True
+                    break
+                frames.append(pd.DataFrame(data, columns=CG_MARKET_COLUMNS))
+                n_rows += len(data)
+                print(f"[CoinGecko] page {page} rows: {len(data)} | total: {n_rows}")
+            if done:
+                break
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
     if df.empty:
         raise RuntimeError("CoinGecko markets returned empty dataset.")
     df["symbol_u"] = df["symbol"].astype(str).str.upper()
-    df["market_cap"] = pd.to_numeric(df.get("market_cap"), errors="coerce")
-    df["fdv_usd"] = pd.to_numeric(df.get("fully_diluted_valuation"), errors="coerce")
+    # market_cap only ranks coins sharing a symbol, so float32 is enough. fdv_usd stays float64:
+    # float32 steps are $32 around the 500M cut-off and would move coins across it.
+    df["market_cap"] = pd.to_numeric(df["market_cap"], errors="coerce").astype("float32")
+    df["fdv_usd"] = pd.to_numeric(df["fully_diluted_valuation"], errors="coerce")
+    if cache_ttl is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            df[[c for c in CG_CACHE_COLUMNS if c in df.columns]].to_parquet(cache_path, index=False)
+        except Exception as e:
+            print(f"[CoinGecko] cache write failed: {e}")
     return df
 
 
 def build_symbol_map(cg: pd.DataFrame) -> Tuple[Dict[str, dict], pd.DataFrame]:
     """Return (symbol->chosen coin row dict, ambiguous table)."""
     keep = ["id", "name", "symbol", "symbol_u", "market_cap", "fdv_usd"]
-    cg2 = cg[[c for c in keep if c in cg.columns]].copy()
+    cg2 = cg[[c for c in keep if c in cg.columns]]
 
-    counts = cg2.groupby("symbol_u")["id"].count().reset_index(name="cg_matches")
-    ambiguous = counts[counts["cg_matches"] > 1].merge(cg2, on="symbol_u", how="left")
+    counts = cg2.groupby("symbol_u")["id"].count()
+    multi = counts[counts > 1]
+    ambiguous = cg2[cg2["symbol_u"].isin(multi.index)].assign(cg_matches=lambda d: d["symbol_u"].map(multi))
+    ambiguous = ambiguous[["symbol_u", "cg_matches"] + [c for c in cg2.columns if c != "symbol_u"]]
     ambiguous = ambiguous.sort_values(["symbol_u", "market_cap"], ascending=[True, False])
 
-    chosen = cg2.sort_values(["symbol_u", "market_cap"], ascending=[True, False]).drop_duplicates(
-        "symbol_u", keep="first"
-    )
-    symbol_map = {row["symbol_u"]: row.to_dict() for _, row in chosen.iterrows()}
+    # Highest market cap per symbol; coins without a market cap only win when nothing else exists.
+    idx = cg2["market_cap"].fillna(float("-inf")).groupby(cg2["symbol_u"]).idxmax()
+    chosen = cg2.loc[idx].set_index("symbol_u", drop=False)
+    symbol_map = chosen.to_dict(orient="index")
     return symbol_map, ambiguous
 
 
 # ------------------------- Exchange fetchers -------------------------
 
-def add_pair(store: Dict[str, Dict[str, List[str]]], base: str, market: str, pair: str) -> None:
-    b = base.upper()
-    store.setdefault(b, {}).setdefault(market, [])
-    store[b][market].append(pair)
+# (symbol, market, pair) rows per exchange; normalized into one frame by merge_exchanges.
+PairRows = List[Tuple[str, str, str]]
+
 
+# Bases repeat heavily across exchanges (BTC, ETH, ...): uppercase each distinct spelling once
+# and share one interned string for it. Plain dict get/set is safe across the fetcher threads.
+_UPPER_BASES: Dict[str, str] = {}
 
-def fetch_okx() -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+
+def add_pair(rows: PairRows, base: str, market: str, pair: str) -> None:
+    b = _UPPER_BASES.get(base)
+    if b is None:
+        b = _UPPER_BASES[base] = sys.intern(base.upper())
+    rows.append((b, sys.intern(market), pair))
+
+
+def fetch_okx() -> PairRows:
+    out: PairRows = []
     for inst_type, market in [("SPOT", "spot"), ("SWAP", "futures"), ("FUTURES", "futures")]:
         print(f"[OKX] fetching {inst_type} instruments ...")
         data = http_get_json("https://www.okx.com/api/v5/public/instruments", params={"instType": inst_type})
@@ -136,8 +217,8 @@ def fetch_okx() -> Dict[str, Dict[str, List[str]]]:
     return out
 
 
-def fetch_gate() -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+def fetch_gate() -> PairRows:
+    out: PairRows = []
 
     print("[Gate.io] fetching spot pairs ...")
     spot = http_get_json("https://api.gateio.ws/api/v4/spot/currency_pairs")
@@ -163,8 +244,8 @@ def fetch_gate() -> Dict[str, Dict[str, List[str]]]:
     return out
 
 
-def fetch_bitget() -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+def fetch_bitget() -> PairRows:
+    out: PairRows = []
 
     print("[Bitget] fetching spot symbols ...")
     spot = http_get_json("https://api.bitget.com/api/v2/spot/public/symbols")
@@ -189,8 +270,8 @@ def fetch_bitget() -> Dict[str, Dict[str, List[str]]]:
     return out
 
 
-def fetch_bybit() -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+def fetch_bybit() -> PairRows:
+    out: PairRows = []
 
     # spot
     print("[Bybit] fetching spot instruments ...")
@@ -223,13 +304,12 @@ def fetch_bybit() -> Dict[str, Dict[str, List[str]]]:
             cursor = res.get("nextPageCursor")
             if not cursor:
                 break
-            time.sleep(0.25)
 
     return out
 
 
-def fetch_binance_futures() -> Dict[str, Dict[str, List[str]]]:
-    out: Dict[str, Dict[str, List[str]]] = {}
+def fetch_binance_futures() -> PairRows:
+    out: PairRows = []
     print("[Binance] fetching USD-M futures exchangeInfo ...")
     data = http_get_json("https://fapi.binance.com/fapi/v1/exchangeInfo")
     for row in data.get("symbols", []):
@@ -242,9 +322,9 @@ def fetch_binance_futures() -> Dict[str, Dict[str, List[str]]]:
     return out
 
 
-def fetch_binance_spot() -> Tuple[Dict[str, Dict[str, List[str]]], str]:
+def fetch_binance_spot() -> Tuple[PairRows, str]:
     """Try exchangeInfo; fallback to ticker/price heuristic."""
-    out: Dict[str, Dict[str, List[str]]] = {}
+    out: PairRows = []
     last_err: Optional[Exception] = None
 
     for url in [
@@ -270,107 +350,112 @@ def fetch_binance_spot() -> Tuple[Dict[str, Dict[str, List[str]]], str]:
     tickers = http_get_json("https://api.binance.com/api/v3/ticker/price")
     symbols = [t.get("symbol") for t in tickers if t.get("symbol")]
 
-    quotes = sorted(
-        [
-            "USDT", "USDC", "FDUSD", "BUSD", "TUSD",
-            "BTC", "ETH", "BNB",
-            "EUR", "GBP", "TRY", "BRL", "AUD", "JPY", "KRW", "INR",
-            "BIDR", "IDRT", "UAH", "ZAR", "ARS", "MXN", "PLN", "RUB", "NGN",
-        ],
-        key=len,
-        reverse=True,
-    )
-
     for sym in symbols:
-        base = None
-        for q in quotes:
-            if sym.endswith(q) and len(sym) > len(q):
-                base = sym[: -len(q)]
-                break
-        if base:
-            add_pair(out, base, "spot", sym)
+        m = BINANCE_QUOTE_RE.search(sym)
+        if m:
+            add_pair(out, sym[: m.start()], "spot", sym)
 
     return out, f"ticker/price heuristic (exchangeInfo failed: {last_err})"
 
 
 # ------------------------- Workbook build -------------------------
 
-def merge_exchanges(ex_map: Dict[str, Dict[str, Dict[str, List[str]]]]) -> pd.DataFrame:
-    rows = []
-    for ex, base_map in ex_map.items():
-        for sym, mkt_map in base_map.items():
-            for mkt, pairs in mkt_map.items():
-                for p in sorted(set(pairs)):
-                    rows.append({"exchange": ex, "symbol": sym, "market": mkt, "pair": p})
-    return pd.DataFrame(rows)
-
-
-def build_exchange_sheet(
-    base_map: Dict[str, Dict[str, List[str]]],
-    symbol_map: Dict[str, dict],
-) -> pd.DataFrame:
-    recs = []
-    for sym, mkt_map in base_map.items():
-        cg = symbol_map.get(sym)
-        recs.append(
-            {
-                "Coin Name (CoinGecko)": cg.get("name") if cg else None,
-                "Symbol": sym,
-                "FDV (USD)": cg.get("fdv_usd") if cg else None,
-                "Spot pairs": ", ".join(sorted(set(mkt_map.get("spot", [])))),
-                "Futures/Perp pairs": ", ".join(sorted(set(mkt_map.get("futures", [])))),
-            }
-        )
-    df = pd.DataFrame(recs)
+def merge_exchanges(ex_map: Dict[str, PairRows]) -> pd.DataFrame:
+    frames = [
+        pd.DataFrame(rows, columns=["symbol", "market", "pair"])
+        .drop_duplicates()
+        .sort_values(["symbol", "market", "pair"])
+        .assign(exchange=ex)
+        for ex, rows in ex_map.items()
+    ]
+    flat = pd.concat(frames, ignore_index=True)
+    return flat[["exchange", "symbol", "market", "pair"]]
+
+
+def build_exchange_sheet(pairs: pd.DataFrame, symbol_map: Dict[str, dict]) -> pd.DataFrame:
+    """One exchange's rows of the normalized pairs frame -> per-symbol sheet."""
+    joined = (
+        pairs.groupby(["symbol", "market"])["pair"]
+        .agg(lambda s: ", ".join(sorted(set(s))))
+        .unstack()
+        .reindex(columns=["spot", "futures"])
+        .fillna("")
+    )
+    cg = pd.DataFrame.from_dict(symbol_map, orient="index")
+    df = pd.DataFrame(
+        {
+            "Coin Name (CoinGecko)": cg["name"].reindex(joined.index).to_numpy(),
+            "Symbol": joined.index.to_numpy(),
+            "FDV (USD)": cg["fdv_usd"].reindex(joined.index).to_numpy(),
+            "Spot pairs": joined["spot"].to_numpy(),
+            "Futures/Perp pairs": joined["futures"].to_numpy(),
+        }
+    )
     df = df[df["FDV (USD)"].notna() & (df["FDV (USD)"] <= FDV_LIMIT_USD)].copy()
     df.sort_values(["Coin Name (CoinGecko)", "Symbol"], inplace=True, na_position="last")
     return df
 
 
+def build_summary(flat: pd.DataFrame, symbol_map: Dict[str, dict]) -> pd.DataFrame:
+    """Per-symbol summary aggregated from the normalized (exchange, symbol, market, pair) rows."""
+    by_sym = flat.groupby("symbol")
+    on_ex = by_sym["exchange"].agg(lambda s: ", ".join(sorted(set(s))))
+    counts = flat.groupby(["symbol", "market"]).size().unstack(fill_value=0)
+    cg = pd.DataFrame.from_dict(symbol_map, orient="index")
+    summary = pd.DataFrame(
+        {
+            "Coin Name (CoinGecko)": cg["name"].reindex(on_ex.index),
+            "FDV (USD)": cg["fdv_usd"].reindex(on_ex.index),
+            "On exchanges": on_ex,
+            "Spot pair count": counts.get("spot", 0),
+            "Futures/perp pair count": counts.get("futures", 0),
+        },
+        index=on_ex.index,
+    )
+    summary = summary.rename_axis("Symbol").reset_index()
+    summary = summary[summary["FDV (USD)"].notna() & (summary["FDV (USD)"] <= FDV_LIMIT_USD)].copy()
+    summary.sort_values(["Coin Name (CoinGecko)", "Symbol"], inplace=True, na_position="last")
+    return summary
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="fdv_le_500m_pairs.xlsx")
     ap.add_argument("--cg_pages", type=int, default=40, help="CoinGecko /coins/markets pages (250 per page)")
+    ap.add_argument("--cg_ttl", type=float, default=3600, help="Reuse cached CoinGecko markets younger than this (sec)")
+    ap.add_argument("--no-cache", action="store_true", help="Always refetch CoinGecko markets")
     args = ap.parse_args()
 
     print("Fetching CoinGecko markets...")
-    cg = fetch_coingecko_markets(max_pages=args.cg_pages)
+    cg = fetch_coingecko_markets(max_pages=args.cg_pages, cache_ttl=None if args.no_cache else args.cg_ttl)
     symbol_map, ambiguous = build_symbol_map(cg)
     print(f"CoinGecko: {len(cg):,} rows | {len(symbol_map):,} unique symbols")
 
     print("Fetching exchange instruments...")
-    ex: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
-
-    ex["OKX"] = fetch_okx()
-    ex["Bybit"] = fetch_bybit()
-    ex["Gate.io"] = fetch_gate()
-    ex["Bitget"] = fetch_bitget()
-
-    bin_spot, bin_note = fetch_binance_spot()
-    ex["Binance (Spot)"] = bin_spot
-    ex["Binance (Futures)"] = fetch_binance_futures()
+    fetchers = {
+        "OKX": fetch_okx,
+        "Bybit": fetch_bybit,
+        "Gate.io": fetch_gate,
+        "Bitget": fetch_bitget,
+        "Binance (Spot)": fetch_binance_spot,
+        "Binance (Futures)": fetch_binance_futures,
+    }
+    # Independent hosts: overlap the network waits, then rebuild `ex` in the fixed order above
+    # so the workbook sheet order does not depend on which exchange answers first.
+    results: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as pool:
+        futures = {pool.submit(fn): name for name, fn in fetchers.items()}
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+
+    bin_spot, bin_note = results["Binance (Spot)"]
+    results["Binance (Spot)"] = bin_spot
+    ex: Dict[str, PairRows] = {name: results[name] for name in fetchers}
 
     print("Building workbook...")
     flat = merge_exchanges(ex)
 
-    # summary by symbol
-    all_syms = sorted({sym for bm in ex.values() for sym in bm.keys()})
-    summary_rows = []
-    for sym in all_syms:
-        cgrow = symbol_map.get(sym)
-        summary_rows.append(
-            {
-                "Symbol": sym,
-                "Coin Name (CoinGecko)": cgrow.get("name") if cgrow else None,
-                "FDV (USD)": cgrow.get("fdv_usd") if cgrow else None,
-                "On exchanges": ", ".join(sorted([k for k, v in ex.items() if sym in v])),
-                "Spot pair count": sum(len(v.get(sym, {}).get("spot", [])) for v in ex.values()),
-                "Futures/perp pair count": sum(len(v.get(sym, {}).get("futures", [])) for v in ex.values()),
-            }
-        )
-    summary = pd.DataFrame(summary_rows)
-    summary = summary[summary["FDV (USD)"].notna() & (summary["FDV (USD)"] <= FDV_LIMIT_USD)].copy()
-    summary.sort_values(["Coin Name (CoinGecko)", "Symbol"], inplace=True, na_position="last")
+    summary = build_summary(flat, symbol_map)
 
     meta = pd.DataFrame(
         [
@@ -381,12 +466,14 @@ def main() -> None:
         ]
     )
 
-    with pd.ExcelWriter(args.out, engine="openpyxl") as writer:
+    # xlsxwriter is write-only and much lighter than openpyxl. Its constant_memory mode is not
+    # used: pandas writes each sheet column by column, which that mode silently truncates.
+    with pd.ExcelWriter(args.out, engine="xlsxwriter") as writer:
         summary.to_excel(writer, sheet_name="Summary", index=False)
 
-        for ex_name, base_map in ex.items():
+        for ex_name, ex_pairs in flat.groupby("exchange", sort=False):
             sheet_name = ex_name[:31]
-            df = build_exchange_sheet(base_map, symbol_map)
+            df = build_exchange_sheet(ex_pairs, symbol_map)
             df.to_excel(writer, sheet_name=sheet_name, index=False)
 
         flat.to_excel(writer, sheet_name="AllPairs_Normalized", index=False)
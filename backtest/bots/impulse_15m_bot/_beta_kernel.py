@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+@njit(cache=True)
+def at_or_before(ts: np.ndarray, target_ms: int) -> int:
+    """Index of the last ts <= target_ms (ts sorted ascending), or -1."""
+    return np.searchsorted(ts, target_ms, side="right") - 1
+
+
+@njit(cache=True)
+def beta_ratio(
+    mid_ts: np.ndarray,
+    mid_val: np.ndarray,
+    cl_ts: np.ndarray,
+    cl_val: np.ndarray,
+    delta_ms: int,
+    lag_ms: int,
+    x_min: float,
+) -> float:
+    """Oracle move / exchange move over the last delta_ms (oracle shifted by lag_ms); NaN if unusable."""
+    n = len(mid_ts)
+    now_ms = mid_ts[n - 1]
+    target_ms = now_ms - delta_ms
+    i = at_or_before(mid_ts, target_ms)
+    if i < 0:
+        return np.nan
+    x = mid_val[n - 1] - mid_val[i]
+    if abs(x) < x_min:
+        return np.nan
+    j_now = at_or_before(cl_ts, now_ms + lag_ms)
+    j_prev = at_or_before(cl_ts, target_ms + lag_ms)
+    if j_now < 0 or j_prev < 0:
+        return np.nan
+    return (cl_val[j_now] - cl_val[j_prev]) / x
+
+
+@njit(cache=True, fastmath=True)
+def upper_median(vals: np.ndarray) -> float:
+    k = len(vals) // 2
+    return np.partition(vals, k)[k]
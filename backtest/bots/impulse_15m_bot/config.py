@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class BotConfig:
     # Beta / lag
     W_BETA_SEC: int = 60
@@ -1,16 +1,28 @@
+import json
 import time
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 ROOT = Path(__file__).resolve().parents[2]
 BASE_DIR = ROOT / "src/out/impulse_15m_bot"
 
 st.set_page_config(page_title="Impulse 15m Bot Monitor", layout="wide")
 
+BOOK_PARSE_ROWS = 5000
+MAX_PLOT_POINTS = 5000
+
 
 def _list_sessions(base_dir: Path) -> list[str]:
     if not base_dir.exists():
@@ -21,13 +33,25 @@ def _list_sessions(base_dir: Path) -> list[str]:
 def _read_parquet(glob_dir: Path, prefix: str) -> pd.DataFrame:
     if not glob_dir.exists():
         return pd.DataFrame()
-    paths = sorted(glob_dir.glob(f"{prefix}_*.parquet"))
+    paths = sorted(glob_dir.glob(f"{prefix}_*.parquet"))[-400:]
     if not paths:
         return pd.DataFrame()
+    sig = []
+    for p in paths:
+        try:
+            sig.append((p.name, p.stat().st_mtime_ns))
+        except OSError:
+            continue
+    return _read_parquet_cached(str(glob_dir), tuple(sig))
+
+
+# Keyed by (name, mtime_ns) of every file, so a refresh only re-reads after a writer flush.
+@st.cache_data(max_entries=32)
+def _read_parquet_cached(glob_dir: str, sig: tuple[tuple[str, int], ...]) -> pd.DataFrame:
     frames = []
-    for p in paths[-400:]:
+    for name, _ in sig:
         try:
-            frames.append(pd.read_parquet(p))
+            frames.append(pd.read_parquet(Path(glob_dir) / name))
         except Exception:
             continue
     if not frames:
@@ -35,30 +59,93 @@ def _read_parquet(glob_dir: Path, prefix: str) -> pd.DataFrame:
     return pd.concat(frames, ignore_index=True)
 
 
-def _pair_trades(fills: pd.DataFrame) -> pd.DataFrame:
-    if fills.empty:
+def _line(df: pd.DataFrame, x: str, y):
+    # WebGL traces plus stride-downsampling keep long sessions interactive in the browser.
+    step = max(1, len(df) // MAX_PLOT_POINTS)
+    return px.line(df.iloc[::step], x=x, y=y, render_mode="webgl")
+
+
+def _first_price(side_json) -> float:
+    try:
+        return float(_json_loads(side_json)[0][0])
+    except Exception:
+        return float("nan")
+
+
+def _trade_events(fills: pd.DataFrame) -> pd.DataFrame:
+    if fills.empty or "action" not in fills.columns:
         return pd.DataFrame()
-    fills = fills.sort_values("ts_ms")
-    trades = []
-    open_pos = None
-    for _, row in fills.iterrows():
-        if row.get("action") == "ENTER":
-            open_pos = row
-        elif row.get("action") == "EXIT" and open_pos is not None:
-            trades.append(
-                {
-                    "entry_ts": open_pos["ts_ms"],
-                    "exit_ts": row["ts_ms"],
-                    "entry_price": open_pos["price"],
-                    "exit_price": row["price"],
-                    "dir": open_pos["dir"],
-                    "reason": row.get("reason"),
-                }
-            )
-            open_pos = None
-    df = pd.DataFrame(trades)
-    if df.empty:
-        return df
+    # Stable sort keeps already-seen events as a fixed prefix for the incremental pairing.
+    fills = fills.sort_values("ts_ms", kind="stable")
+    return fills[fills["action"].isin(["ENTER", "EXIT"])]
+
+
+def _pair_events(ev: pd.DataFrame) -> pd.DataFrame:
+    if ev.empty:
+        return pd.DataFrame()
+    # An EXIT closes the most recent ENTER unless another EXIT already did, i.e. a trade is
+    # exactly an EXIT whose previous ENTER/EXIT event is an ENTER.
+    action = ev["action"].to_numpy()
+    exit_idx = np.flatnonzero((action[1:] == "EXIT") & (action[:-1] == "ENTER")) + 1
+    if exit_idx.size == 0:
+        return pd.DataFrame()
+    entry_idx = exit_idx - 1
+    ts_ms = ev["ts_ms"].to_numpy()
+    price = ev["price"].to_numpy()
+    reason = ev["reason"].to_numpy() if "reason" in ev.columns else np.full(len(ev), None, dtype=object)
+    return pd.DataFrame(
+        {
+            "entry_ts": ts_ms[entry_idx],
+            "exit_ts": ts_ms[exit_idx],
+            "entry_price": price[entry_idx],
+            "exit_price": price[exit_idx],
+            "dir": ev["dir"].to_numpy()[entry_idx],
+            "reason": reason[exit_idx],
+        }
+    )
+
+
+def _event_key(ev: pd.DataFrame, i: int) -> tuple | None:
+    if not 0 <= i < len(ev):
+        return None
+    row = ev.iloc[i]
+    return (int(row["ts_ms"]), row["action"])
+
+
+def _pair_trades(fills: pd.DataFrame, session: str) -> pd.DataFrame:
+    ev = _trade_events(fills)
+    n_events = len(ev)
+    # The fills read is capped to the newest files, so the oldest events can drop off the front
+    # of ev; the first and last already-paired events must still sit where the state left them.
+    head = _event_key(ev, 0)
+    state = st.session_state.get("_trade_pairs")
+    if (
+        state is None
+        or state["session"] != session
+        or n_events < state["n_events"]
+        or head != state["head"]
+        or _event_key(ev, state["n_events"] - 1) != state["tail"]
+    ):
+        pairs = _pair_events(ev)
+    else:
+        # Closed pairs never change and pairing only looks at consecutive events, so rescan
+        # from the last processed event (it may be the ENTER of a still-open position).
+        new_pairs = _pair_events(ev.iloc[max(state["n_events"] - 1, 0):])
+        pairs = state["pairs"]
+        if pairs.empty:
+            pairs = new_pairs
+        elif not new_pairs.empty:
+            pairs = pd.concat([pairs, new_pairs], ignore_index=True)
+    st.session_state["_trade_pairs"] = {
+        "session": session,
+        "n_events": n_events,
+        "head": head,
+        "tail": _event_key(ev, n_events - 1),
+        "pairs": pairs,
+    }
+    if pairs.empty:
+        return pairs
+    df = pairs.copy()
     df["pnl_pts"] = (df["exit_price"] - df["entry_price"]) * df["dir"]
     df["cum_pnl_pts"] = df["pnl_pts"].cumsum()
     df["entry_ts"] = pd.to_datetime(df["entry_ts"], unit="ms", utc=True, errors="coerce")
@@ -95,7 +182,7 @@ if not signals.empty:
     if cols:
         for c in cols:
             signals[c] = pd.to_numeric(signals[c], errors="coerce")
-        fig = px.line(signals, x="ts", y=cols)
+        fig = _line(signals, x="ts", y=cols)
         st.plotly_chart(fig, width="stretch")
     else:
         st.info("No signal columns found yet.")
@@ -103,41 +190,39 @@ if not signals.empty:
 if not pm.empty:
     pm["ts"] = pd.to_datetime(pm["ts_ms"], unit="ms", utc=True, errors="coerce")
     st.subheader("Polymarket chance")
-    st.plotly_chart(px.line(pm, x="ts", y="chance"), width="stretch")
+    st.plotly_chart(_line(pm, x="ts", y="chance"), width="stretch")
 
 if not chainlink.empty:
     chainlink["ts"] = pd.to_datetime(chainlink["ts_ms"], unit="ms", utc=True, errors="coerce")
     st.subheader("Chainlink price")
-    st.plotly_chart(px.line(chainlink, x="ts", y="price"), width="stretch")
+    st.plotly_chart(_line(chainlink, x="ts", y="price"), width="stretch")
 
 exch_book = _read_parquet(session_dir, "raw_exch_book")
 if not exch_book.empty:
+    # Only the most recent snapshots are plotted; parse just those.
+    exch_book = exch_book.sort_values("ts_ms").tail(BOOK_PARSE_ROWS).copy()
     exch_book["ts"] = pd.to_datetime(exch_book["ts_ms"], unit="ms", utc=True, errors="coerce")
     st.subheader("Exchange mid + spread (orderbook)")
-    def _best(bids, asks):
-        try:
-            b = json.loads(bids)[0][0]
-            a = json.loads(asks)[0][0]
-            return float(b), float(a)
-        except Exception:
-            return None, None
-    best = exch_book.apply(lambda r: _best(r["bids"], r["asks"]), axis=1, result_type="expand")
-    exch_book["best_bid"] = best[0]
-    exch_book["best_ask"] = best[1]
+    exch_book["best_bid"] = np.fromiter(
+        (_first_price(b) for b in exch_book["bids"].to_numpy()), dtype=float, count=len(exch_book)
+    )
+    exch_book["best_ask"] = np.fromiter(
+        (_first_price(a) for a in exch_book["asks"].to_numpy()), dtype=float, count=len(exch_book)
+    )
     exch_book["mid"] = (exch_book["best_bid"] + exch_book["best_ask"]) / 2.0
     exch_book["spread"] = exch_book["best_ask"] - exch_book["best_bid"]
-    fig_m = px.line(exch_book, x="ts", y="mid")
-    fig_s = px.line(exch_book, x="ts", y="spread")
+    fig_m = _line(exch_book, x="ts", y="mid")
+    fig_s = _line(exch_book, x="ts", y="spread")
     st.plotly_chart(fig_m, width="stretch")
     st.plotly_chart(fig_s, width="stretch")
 
     st.subheader("Orderbook (latest snapshot)")
-    latest = exch_book.sort_values("ts_ms").tail(1)
+    latest = exch_book.tail(1)
     if not latest.empty:
         row = latest.iloc[0]
         try:
-            bids = json.loads(row["bids"])
-            asks = json.loads(row["asks"])
+            bids = _json_loads(row["bids"])
+            asks = _json_loads(row["asks"])
         except Exception:
             bids, asks = [], []
         depth = min(10, len(bids), len(asks))
@@ -162,10 +247,10 @@ exch_trades = _read_parquet(session_dir, "raw_exch_trades")
 if not exch_trades.empty:
     exch_trades["ts"] = pd.to_datetime(exch_trades["ts_ms"], unit="ms", utc=True, errors="coerce")
     st.subheader("Exchange trade price")
-    st.plotly_chart(px.line(exch_trades, x="ts", y="price"), width="stretch")
+    st.plotly_chart(_line(exch_trades, x="ts", y="price"), width="stretch")
 
 st.subheader("PnL (paper)")
-trades = _pair_trades(fills)
+trades = _pair_trades(fills, sel)
 if trades.empty:
     st.info("No completed trades yet.")
 else:
@@ -1,11 +1,45 @@
 from __future__ import annotations
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+TAKER_FEE_PEAK = 0.0156
+
+
 def taker_fee_rate(price: float) -> float:
     """Approximate 15m market taker fee rate (max ~1.56% at p=0.5)."""
     p = max(0.0, min(1.0, price))
-    peak = 0.0156
-    return peak * max(0.0, 1.0 - 2.0 * abs(p - 0.5))
+    return TAKER_FEE_PEAK * max(0.0, 1.0 - 2.0 * abs(p - 0.5))
 
 
 def fee_usdc(price: float, shares: float) -> float:
     return taker_fee_rate(price) * price * shares
+
+
+def taker_fee_rate_array(prices: np.ndarray) -> np.ndarray:
+    """Vectorized taker_fee_rate over an array of prices."""
+    p = np.clip(np.asarray(prices, dtype=np.float64), 0.0, 1.0)
+    return TAKER_FEE_PEAK * np.maximum(0.0, 1.0 - 2.0 * np.abs(p - 0.5))
+
+
+def fee_usdc_array(prices: np.ndarray, shares: float | np.ndarray) -> np.ndarray:
+    prices = np.asarray(prices, dtype=np.float64)
+    return taker_fee_rate_array(prices) * prices * shares
+
+
+# Scalar kernels for numba-compiled backtest loops. Plain Python callers should keep using
+# taker_fee_rate/fee_usdc: calling a jitted function from the interpreter costs more than the
+# arithmetic it saves. Without numba these are the Python functions above.
+if njit is not None:
+    taker_fee_rate_jit = njit(cache=True, fastmath=True)(taker_fee_rate)
+
+    @njit(cache=True, fastmath=True)
+    def fee_usdc_jit(price: float, shares: float) -> float:
+        return taker_fee_rate_jit(price) * price * shares
+else:
+    taker_fee_rate_jit = taker_fee_rate
+    fee_usdc_jit = fee_usdc
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+class TimeSeriesRing:
+    """Sliding time window of (ts_ms, value, ...) rows in preallocated NumPy columns.
+
+    Rows are appended in time order and rows older than ``window_ms`` before the newest one are
+    dropped. The live rows always form one contiguous slice, so readers get plain array views
+    (no copies) that can be summed or searched directly.
+    """
+
+    def __init__(self, window_ms: int, n_values: int = 1, capacity: int = 4096):
+        self.window_ms = int(window_ms)
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._vals = [np.empty(capacity, dtype=np.float64) for _ in range(n_values)]
+        self._lo = 0
+        self._hi = 0
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def _make_room(self) -> None:
+        live = self._hi - self._lo
+        cap = len(self._ts)
+        if live * 2 > cap:
+            cap *= 2
+        ts = np.empty(cap, dtype=np.int64)
+        ts[:live] = self._ts[self._lo : self._hi]
+        vals = []
+        for col in self._vals:
+            new = np.empty(cap, dtype=np.float64)
+            new[:live] = col[self._lo : self._hi]
+            vals.append(new)
+        self._ts = ts
+        self._vals = vals
+        self._lo = 0
+        self._hi = live
+
+    def append(self, ts_ms: int, *values: float) -> None:
+        if self._hi == len(self._ts):
+            self._make_room()
+        hi = self._hi
+        self._ts[hi] = ts_ms
+        for col, v in zip(self._vals, values):
+            col[hi] = v
+        self._hi = hi + 1
+        cutoff = ts_ms - self.window_ms
+        if self._ts[self._lo] < cutoff:
+            self._lo += int(np.searchsorted(self._ts[self._lo : self._hi], cutoff, side="left"))
+
+    def clear(self) -> None:
+        self._lo = 0
+        self._hi = 0
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self._ts[self._lo : self._hi]
+
+    def values(self, col: int = 0) -> np.ndarray:
+        return self._vals[col][self._lo : self._hi]
+
+    def value_at_or_before(self, ts_ms: int, col: int = 0) -> Optional[float]:
+        """Value of the newest row with ts <= ts_ms (binary search), or None if there is none."""
+        ts = self._ts[self._lo : self._hi]
+        i = int(np.searchsorted(ts, ts_ms, side="right")) - 1
+        if i < 0:
+            return None
+        return float(self._vals[col][self._lo + i])
+
+    def last(self, col: int = 0) -> tuple[int, float]:
+        i = self._hi - 1
+        return int(self._ts[i]), float(self._vals[col][i])
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# One writer thread shared by every RollingParquetWriter: closed windows are written off the
+# event loop, and in submission order, so two flushes of the same file never interleave.
+_flush_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parquet-flush")
 
 
 def _bucket_start_ms(ts_ms: int, window_sec: int) -> int:
@@ -13,6 +20,28 @@ def _bucket_start_ms(ts_ms: int, window_sec: int) -> int:
     return (int(ts_ms) // step) * step
 
 
+def _write_columns(path: Path, cols: dict[str, list], compression: str) -> None:
+    table = pa.Table.from_pydict(cols)
+    if path.exists():
+        try:
+            existing = pd.read_parquet(path)
+            df = pd.concat([existing, table.to_pandas()], ignore_index=True)
+            if "ts_ms" in df.columns:
+                df = df.drop_duplicates(subset=["ts_ms"]).sort_values("ts_ms")
+            df.to_parquet(path, index=False, compression=compression)
+            return
+        except Exception:
+            pass
+    pq.write_table(table, path, compression=compression)
+
+
+def _report_failure(fut: Future, path: Path) -> None:
+    # runs on the flush thread; the window's rows were handed off and are lost with the write
+    exc = fut.exception()
+    if exc is not None:
+        print(f"[WARN] parquet flush failed for {path}: {exc!r}", flush=True)
+
+
 @dataclass
 class RollingParquetWriter:
     out_dir: Path
@@ -20,7 +49,9 @@ class RollingParquetWriter:
     window_sec: int = 300
     compression: str = "snappy"
     _bucket_ms: int | None = None
-    _rows: list[dict[str, Any]] = field(default_factory=list)
+    # rows are buffered column-wise; a key missing from a row is stored as None
+    _cols: dict[str, list[Any]] = field(default_factory=dict)
+    _n: int = 0
 
     def write(self, row: dict[str, Any]) -> None:
         ts_ms = int(row["ts_ms"])
@@ -28,28 +59,72 @@ class RollingParquetWriter:
         if self._bucket_ms is None:
             self._bucket_ms = bucket_ms
         if bucket_ms != self._bucket_ms:
-            self.flush()
+            self._flush_async()
+            self._bucket_ms = bucket_ms
+        n = self._n
+        cols = self._cols
+        for key, value in row.items():
+            col = cols.get(key)
+            if col is None:
+                col = cols[key] = [None] * n
+            col.append(value)
+        if len(row) != len(cols):
+            for col in cols.values():
+                if len(col) == n:
+                    col.append(None)
+        self._n = n + 1
+
+    def write_many(self, rows: list[dict[str, Any]]) -> None:
+        """Same as write() per row; a time-ordered batch of same-shaped rows within one window
+        is appended column by column."""
+        if not rows:
+            return
+        bucket_ms = _bucket_start_ms(int(rows[0]["ts_ms"]), self.window_sec)
+        keys = rows[0].keys()
+        if (
+            _bucket_start_ms(int(rows[-1]["ts_ms"]), self.window_sec) != bucket_ms
+            or (self._n and keys != self._cols.keys())
+            or any(row.keys() != keys for row in rows)
+        ):
+            for row in rows:
+                self.write(row)
+            return
+        if self._bucket_ms is None:
+            self._bucket_ms = bucket_ms
+        if bucket_ms != self._bucket_ms:
+            self._flush_async()
             self._bucket_ms = bucket_ms
-        self._rows.append(row)
+        if not self._n:
+            self._cols = {key: [] for key in keys}
+        for key, col in self._cols.items():
+            col.extend([row[key] for row in rows])
+        self._n += len(rows)
 
     def _path_for_bucket(self, bucket_ms: int) -> Path:
         ts = datetime.fromtimestamp(bucket_ms / 1000, tz=timezone.utc)
         name = f"{self.prefix}_{ts.strftime('%Y%m%dT%H%M%SZ')}.parquet"
         return self.out_dir / name
 
-    def flush(self) -> None:
-        if not self._rows:
-            return
+    def _take(self) -> tuple[Path, dict[str, list[Any]]] | None:
+        if not self._n:
+            return None
         self.out_dir.mkdir(parents=True, exist_ok=True)
-        path = self._path_for_bucket(self._bucket_ms or 0)
-        df = pd.DataFrame(self._rows)
-        if path.exists():
-            try:
-                existing = pd.read_parquet(path)
-                df = pd.concat([existing, df], ignore_index=True)
-                if "ts_ms" in df.columns:
-                    df = df.drop_duplicates(subset=["ts_ms"]).sort_values("ts_ms")
-            except Exception:
-                pass
-        df.to_parquet(path, index=False, compression=self.compression)
-        self._rows.clear()
+        taken = (self._path_for_bucket(self._bucket_ms or 0), self._cols)
+        self._cols = {}
+        self._n = 0
+        return taken
+
+    def _flush_async(self) -> Future | None:
+        taken = self._take()
+        if taken is None:
+            return None
+        path, cols = taken
+        fut = _flush_executor.submit(_write_columns, path, cols, self.compression)
+        fut.add_done_callback(lambda f: _report_failure(f, path))
+        return fut
+
+    def flush(self) -> None:
+        """Write the open window now, after any window flushes still queued."""
+        fut = self._flush_async()
+        if fut is not None:
+            fut.result()
@@ -9,19 +9,59 @@ import math
 import os
 import sys
 import time
-import urllib.request
-from collections import deque
+import urllib.parse
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
+import aiohttp
+import numpy as np
 import websockets
-from web3 import Web3
+from web3 import AsyncWeb3
 
-from fee_model import fee_usdc
+from _beta_kernel import beta_ratio, upper_median
+from fee_model import fee_usdc_array
+from ring_buffer import TimeSeriesRing
 from rolling_parquet import RollingParquetWriter
 from config import BotConfig
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    def _levels_json(levels: np.ndarray) -> str:
+        return orjson.dumps(levels, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+    def _levels_json(levels: np.ndarray) -> str:
+        return json.dumps(levels.tolist())
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    from py_clob_client.clob_types import (
+        BalanceAllowanceParams,
+        MarketOrderArgs,
+        OrderType,
+        AssetType,
+    )
+    from py_clob_client.order_builder.constants import BUY, SELL
+
+    _CLOB_IMPORT_ERROR: Exception | None = None
+except Exception as exc:  # only needed for --live
+    BalanceAllowanceParams = MarketOrderArgs = OrderType = AssetType = None
+    BUY = SELL = None
+    _CLOB_IMPORT_ERROR = exc
+
 REPO_ROOT = Path(__file__).resolve().parents[2]
 LIBS_DIR = REPO_ROOT / "libs"
 if str(LIBS_DIR) not in sys.path:
@@ -29,7 +69,8 @@ if str(LIBS_DIR) not in sys.path:
 
 from polymarket_utils import (
     ET_TZ,
-    fetch_market_by_slug,
+    GAMMA_MARKETS_BY_SLUG,
+    GAMMA_UA,
     find_active_market_by_time,
     infer_slug_prefix,
     normalize_slug,
@@ -38,10 +79,23 @@ from polymarket_utils import (
 
 PM_WS = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
 PM_RTDS_WS = "wss://ws-live-data.polymarket.com"
+RTDS_TOPIC = "crypto_prices_chainlink"
+RTDS_SYMBOL = "btc/usd"
+RTDS_PING_SEC = 5.0
 BINANCE_WS = "wss://stream.binance.com:9443/stream?streams=btcusdt@aggTrade/btcusdt@depth10@100ms"
 COINBASE_TICKER = "https://api.exchange.coinbase.com/products/BTC-USD/ticker"
 COINBASE_BOOK = "https://api.exchange.coinbase.com/products/BTC-USD/book?level=2"
 
+# decision_loop wakes on new market data, at most once per DECISION_MIN_MS; beta refresh is rarer
+DECISION_MIN_MS = 20
+BETA_UPDATE_MS = 100
+# signals / pm quotes are handed to their writers in batches, at least every ROW_BATCH_FLUSH_SEC
+ROW_BATCH = 64
+ROW_BATCH_FLUSH_SEC = 0.5
+# websocket frames from all feeds go through one queue and are handled in batches of up to MSG_BATCH
+MSG_QUEUE_MAX = 1024
+MSG_BATCH = 64
+
 CHAINLINK_FEED = "0xc907E116054Ad103354f2D350FD2514433D57F6f"
 AGGREGATOR_V3_ABI = [
     {
@@ -67,12 +121,37 @@ AGGREGATOR_V3_ABI = [
 ]
 
 
+_iso_sec = -1
+_iso_str = ""
+
+
 def utc_iso_from_ms(ms: int) -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ms / 1000)) + "Z"
+    # rows arrive many per second; only reformat when the second changes
+    global _iso_sec, _iso_str
+    sec = int(ms) // 1000
+    if sec != _iso_sec:
+        _iso_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec)) + "Z"
+        _iso_sec = sec
+    return _iso_str
+
+
+def _levels(rows: list, n: int) -> np.ndarray:
+    """Top-n book rows as an (n, 2) float64 array of [price, qty] (extra fields dropped)."""
+    # exchanges send [price, qty, ...] as strings; Coinbase appends an order count
+    return np.array([row[:2] for row in rows[:n]], dtype=np.float64).reshape(-1, 2)
+
+
+def _top_usd(levels: np.ndarray) -> float:
+    # np.float64 is a float subclass: NumPy scalar results are used as-is throughout
+    return levels[:, 0] @ levels[:, 1]
 
 
 def _sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + math.exp(-x))
+    # exp only ever sees a non-positive argument, so large |x| cannot overflow
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
 
 
 def _parse_slug_epoch(slug: str) -> Optional[int]:
@@ -89,22 +168,44 @@ def _build_epoch_slug(prefix: str, epoch_s: int) -> str:
     return f"{prefix}-{int(epoch_s)}"
 
 
-def _find_active_epoch_market(prefix: str, step_s: int = 900, search_steps: int = 6) -> tuple[dict, str]:
+async def _fetch_market_by_slug(http: aiohttp.ClientSession, slug: str) -> dict:
+    """polymarket_utils.fetch_market_by_slug over the shared session, so it has the session's
+    timeout and cancelling it aborts the request."""
+    url = GAMMA_MARKETS_BY_SLUG + urllib.parse.quote(normalize_slug(slug))
+    async with http.get(url, headers={"User-Agent": GAMMA_UA}) as resp:
+        data = _json_loads(await resp.read())
+    markets = data.get("markets", []) if isinstance(data, dict) else data
+    if not markets:
+        raise ValueError(f"No market found for slug: {slug}")
+    return markets[0]
+
+
+async def _find_active_epoch_market(
+    http: aiohttp.ClientSession, prefix: str, step_s: int = 900, search_steps: int = 6
+) -> tuple[dict, str]:
     now_s = int(time.time())
     base = (now_s // step_s) * step_s
-    offsets = [0]
+    slug = _build_epoch_slug(prefix, base)
+    try:
+        return await _fetch_market_by_slug(http, slug), slug
+    except Exception as exc:
+        last_err = exc
+    # current epoch missed: look the neighbours up at once, still preferring them in offset order
+    offsets = []
     for i in range(1, search_steps + 1):
         offsets.append(i)
         offsets.append(-i)
-    last_err = None
-    for off in offsets:
-        slug = _build_epoch_slug(prefix, base + off * step_s)
-        try:
-            market = fetch_market_by_slug(slug)
-            return market, slug
-        except Exception as exc:
-            last_err = exc
-            continue
+    slugs = [_build_epoch_slug(prefix, base + off * step_s) for off in offsets]
+    tasks = [asyncio.create_task(_fetch_market_by_slug(http, slug)) for slug in slugs]
+    try:
+        for slug, task in zip(slugs, tasks):
+            try:
+                return await task, slug
+            except Exception as exc:
+                last_err = exc
+    finally:
+        for task in tasks:
+            task.cancel()
     raise ValueError(f"No market found for prefix: {prefix} ({last_err})")
 
 
@@ -140,6 +241,7 @@ class ShadowBot:
         self.live = live
         self.order_usdc = order_usdc
         self.order_type = order_type
+        self._order_type_enum = OrderType(order_type) if live and OrderType is not None else None
 
         self.exch_trades = RollingParquetWriter(out_dir, "raw_exch_trades", window_sec=300)
         self.exch_book = RollingParquetWriter(out_dir, "raw_exch_book", window_sec=300)
@@ -148,16 +250,24 @@ class ShadowBot:
         self.pm_quotes = RollingParquetWriter(out_dir, "raw_pm_quotes", window_sec=300)
         self.signals = RollingParquetWriter(out_dir, "signals", window_sec=300)
         self.fills = RollingParquetWriter(out_dir, "paper_fills", window_sec=300)
-
-        self.trade_window = {"BINANCE": deque(), "COINBASE": deque()}
-        self.price_window = {"BINANCE": deque(), "COINBASE": deque()}
+        self._signal_buf: list[dict] = []
+        self._pm_quote_buf: list[dict] = []
+        self._last_chance: Optional[float] = None
+        self._last_chance_ts_ms: Optional[int] = None
+        # SHARES is fixed, so fee_usdc(chance, SHARES) is tabulated once at 1bp price steps
+        self._fee_table = fee_usdc_array(np.linspace(0.0, 1.0, 10_001), cfg.SHARES)
+
+        # per-exchange trade USD over the last 500ms (sweep) and prices over the last 5s
+        self.trade_window = {ex: TimeSeriesRing(500) for ex in ("BINANCE", "COINBASE")}
+        self.price_window = {ex: TimeSeriesRing(5000) for ex in ("BINANCE", "COINBASE")}
         self.candle_min = {}
         self.candle = {}
-        self.book_snap = None
-        self.book_prev = None
-        self.chainlink_hist = deque()
-        self.exch_mid_hist = deque()
-        self.chainlink_rtds = deque()
+        self.book_snap: dict[str, dict] = {}
+        self.book_prev: dict[str, dict] = {}
+        self.chainlink_hist = TimeSeriesRing(cfg.W_BETA_SEC * 1000)
+        self.exch_mid_hist = TimeSeriesRing(cfg.W_BETA_SEC * 1000)
+        self._beta_samples = TimeSeriesRing(cfg.W_BETA_SEC * 1000)
+        self.chainlink_rtds = TimeSeriesRing(5_000)
         self.ptb_price: Optional[float] = None
         self.ptb_ts_ms: Optional[int] = None
         self.beta_state = BetaState()
@@ -171,17 +281,23 @@ class ShadowBot:
         self.tokens = None
         self.client = None
         self._market_lock = asyncio.Lock()
+        self._http: aiohttp.ClientSession | None = None
+        self._tick_event = asyncio.Event()
+        self._msg_q: asyncio.Queue[tuple[str, str]] = asyncio.Queue(maxsize=MSG_QUEUE_MAX)
+        self._pm_sub_tokens = None
+        self._pm_latest = {"yes_bid": None, "yes_ask": None}
+        self._last_beta_ms = 0
 
     def _record_trade(self, exchange: str, price: float, qty: float, ts_ms: int, is_buy: Optional[bool]):
         usd = price * qty
-        tw = self.trade_window.setdefault(exchange, deque())
-        tw.append((ts_ms, usd, is_buy))
-        while tw and ts_ms - tw[0][0] > 500:
-            tw.popleft()
-        pw = self.price_window.setdefault(exchange, deque())
-        pw.append((ts_ms, price))
-        while pw and ts_ms - pw[0][0] > 5000:
-            pw.popleft()
+        tw = self.trade_window.get(exchange)
+        if tw is None:
+            tw = self.trade_window[exchange] = TimeSeriesRing(500)
+        tw.append(ts_ms, usd)
+        pw = self.price_window.get(exchange)
+        if pw is None:
+            pw = self.price_window[exchange] = TimeSeriesRing(5000)
+        pw.append(ts_ms, price)
         self.exch_trades.write(
             {
                 "ts": utc_iso_from_ms(ts_ms),
@@ -195,6 +311,103 @@ class ShadowBot:
         )
         self._update_candle(exchange, ts_ms, price)
 
+    def _on_binance_message(self, msg: dict) -> None:
+        payload = msg.get("data", msg)
+        if payload.get("e") == "aggTrade":
+            price = float(payload["p"])
+            qty = float(payload["q"])
+            ts_ms = int(payload.get("T") or payload.get("E") or time.time() * 1000)
+            is_buy = not payload.get("m", False)
+            self._record_trade("BINANCE", price, qty, ts_ms, is_buy)
+        else:
+            is_depth_update = payload.get("e") == "depthUpdate"
+            bids = payload.get("b") if is_depth_update else payload.get("bids")
+            asks = payload.get("a") if is_depth_update else payload.get("asks")
+            if bids is not None and asks is not None:
+                bids = _levels(bids, self.cfg.BOOK_TOP_N)
+                asks = _levels(asks, self.cfg.BOOK_TOP_N)
+                ts_ms = int(payload.get("E") or time.time() * 1000)
+                self._update_book("BINANCE", bids, asks, ts_ms)
+
+    def _buffer_row(self, buf: list[dict], writer: RollingParquetWriter, row: dict) -> None:
+        buf.append(row)
+        if len(buf) >= ROW_BATCH:
+            writer.write_many(buf)
+            buf.clear()
+
+    def _flush_row_buffers(self) -> None:
+        for buf, writer in ((self._signal_buf, self.signals), (self._pm_quote_buf, self.pm_quotes)):
+            if buf:
+                writer.write_many(buf)
+                buf.clear()
+
+    def _on_pm_message(self, data) -> None:
+        tokens = self._pm_sub_tokens
+        latest = self._pm_latest
+        events = data if isinstance(data, list) else data.get("data") or [data]
+        for event in events:
+            if event.get("event_type") != "best_bid_ask":
+                continue
+            asset_id = event.get("asset_id")
+            bid = event.get("best_bid")
+            ask = event.get("best_ask")
+            if asset_id == tokens.yes_token_id:
+                latest["yes_bid"] = float(bid) if bid is not None else None
+                latest["yes_ask"] = float(ask) if ask is not None else None
+
+            if latest["yes_bid"] is not None and latest["yes_ask"] is not None:
+                now_ms = int(time.time() * 1000)
+                chance = (latest["yes_bid"] + latest["yes_ask"]) / 2.0
+                quote = {
+                    "ts": utc_iso_from_ms(now_ms),
+                    "ts_ms": now_ms,
+                    "chance": chance,
+                    "yes_bid": latest["yes_bid"],
+                    "yes_ask": latest["yes_ask"],
+                }
+                self._last_chance = chance
+                self._last_chance_ts_ms = now_ms
+                self._buffer_row(self._pm_quote_buf, self.pm_quotes, quote)
+
+    def _on_rtds_message(self, msg: dict) -> None:
+        # the subscription is already filtered to btc/usd; check anyway, PTB gates entries
+        if msg.get("topic") != RTDS_TOPIC:
+            return
+        payload = msg.get("payload") or {}
+        if (payload.get("symbol") or "").lower() != RTDS_SYMBOL:
+            return
+        ts_ms = payload.get("timestamp") or msg.get("timestamp")
+        val = payload.get("value")
+        try:
+            ts_ms = int(ts_ms)
+            price = float(val)
+        except Exception:
+            return
+        self.chainlink_rtds.append(ts_ms, price)
+        # follow market switches: the window start comes from the current slug
+        epoch = _parse_slug_epoch(self.slug or "")
+        if epoch is not None:
+            self._maybe_set_ptb(epoch * 1000)
+
+    def _maybe_set_ptb(self, start_ms: int) -> None:
+        if self.ptb_price is not None:
+            return
+        rtds = self.chainlink_rtds
+        if not len(rtds):
+            return
+        ts = rtds.ts
+        # samples bracketing the window start; the earlier one wins a tie
+        i_before = int(np.searchsorted(ts, start_ms, side="right")) - 1
+        i_after = int(np.searchsorted(ts, start_ms, side="left"))
+        cand = []
+        if i_before >= 0:
+            cand.append(i_before)
+        if i_after < len(ts):
+            cand.append(i_after)
+        best = min(cand, key=lambda i: abs(int(ts[i]) - start_ms))
+        self.ptb_ts_ms = int(ts[best])
+        self.ptb_price = float(rtds.values()[best])
+
     def _update_candle(self, exchange: str, ts_ms: int, price: float) -> None:
         minute = ts_ms // 60000
         if self.candle_min.get(exchange) is None:
@@ -221,127 +434,85 @@ class ShadowBot:
             self.candle[exchange]["low"] = min(self.candle[exchange]["low"], price)
             self.candle[exchange]["close"] = price
 
-    def _update_book(self, exchange: str, bids: list, asks: list, ts_ms: int):
-        if self.book_snap is None:
-            self.book_snap = {}
-            self.book_prev = {}
+    def _update_book(self, exchange: str, bids: np.ndarray, asks: np.ndarray, ts_ms: int):
         self.book_prev[exchange] = self.book_snap.get(exchange)
-        self.book_snap[exchange] = {"bids": bids, "asks": asks, "ts_ms": ts_ms}
+        self.book_snap[exchange] = {
+            "bids": bids,
+            "asks": asks,
+            "ts_ms": ts_ms,
+            "bids_usd": _top_usd(bids),
+            "asks_usd": _top_usd(asks),
+        }
         self.exch_book.write(
             {
                 "ts": utc_iso_from_ms(ts_ms),
                 "ts_ms": ts_ms,
                 "exchange": exchange,
-                "bids": json.dumps(bids),
-                "asks": json.dumps(asks),
+                "bids": _levels_json(bids),
+                "asks": _levels_json(asks),
             }
         )
 
-        mid = None
-        if bids and asks:
-            try:
-                mid = (float(bids[0][0]) + float(asks[0][0])) / 2.0
-            except Exception:
-                mid = None
-        if mid is not None:
-            self.exch_mid_hist.append((ts_ms, mid))
-            while self.exch_mid_hist and ts_ms - self.exch_mid_hist[0][0] > self.cfg.W_BETA_SEC * 1000:
-                self.exch_mid_hist.popleft()
-
-    def _book_liq_usd(self, side: str) -> float:
-        snap = self.book_snap
-        if not snap:
-            return 0.0
-        rows = snap.get(side) or []
-        total = 0.0
-        for p, q in rows[: self.cfg.BOOK_TOP_N]:
-            try:
-                total += float(p) * float(q)
-            except Exception:
-                continue
-        return total
+        if len(bids) and len(asks):
+            # Binance books carry exchange time E and Coinbase books local time, but the ring's
+            # binary searches need ordered stamps: both feeds use the local receive clock here
+            hist = self.exch_mid_hist
+            recv_ms = int(time.time() * 1000)
+            if len(hist):
+                recv_ms = max(recv_ms, hist.last()[0])
+            hist.append(recv_ms, (bids[0, 0] + asks[0, 0]) / 2.0)
 
     def _book_drop_usd(self, exchange: str, direction: int) -> float:
-        if not self.book_prev or not self.book_snap:
-            return 0.0
         prev_snap = self.book_prev.get(exchange)
         cur_snap = self.book_snap.get(exchange)
-        if not prev_snap or not cur_snap:
+        if prev_snap is None or cur_snap is None:
             return 0.0
-        if direction == 1:
-            prev = self._liq_from_snap(prev_snap, "asks")
-            cur = self._liq_from_snap(cur_snap, "asks")
-        else:
-            prev = self._liq_from_snap(prev_snap, "bids")
-            cur = self._liq_from_snap(cur_snap, "bids")
-        return max(0.0, prev - cur)
-
-    def _liq_from_snap(self, snap: dict, side: str) -> float:
-        rows = snap.get(side) or []
-        total = 0.0
-        for p, q in rows[: self.cfg.BOOK_TOP_N]:
-            try:
-                total += float(p) * float(q)
-            except Exception:
-                continue
-        return total
+        side = "asks_usd" if direction == 1 else "bids_usd"
+        return max(0.0, prev_snap[side] - cur_snap[side])
 
     def _price_delta_5s(self, exchange: str) -> float:
-        pw = self.price_window.get(exchange) or deque()
-        if len(pw) < 2:
+        pw = self.price_window.get(exchange)
+        if pw is None or len(pw) < 2:
             return 0.0
-        now_ms, now_price = pw[-1]
-        past_price = next((p for t, p in pw if now_ms - t >= 5000), None)
+        now_ms, now_price = pw.last()
+        # price 5s ago if the window reaches that far back, else the oldest price held
+        past_price = pw.value_at_or_before(now_ms - 5000)
         if past_price is None:
-            past_price = pw[0][1]
+            past_price = pw.values()[0]
         return now_price - past_price
 
     def _sweep_usd(self, exchange: str) -> float:
-        tw = self.trade_window.get(exchange) or deque()
-        total = 0.0
-        for _ts, usd, _side in tw:
-            try:
-                total += float(usd)
-            except Exception:
-                continue
-        return total
+        tw = self.trade_window.get(exchange)
+        if tw is None:
+            return 0.0
+        return tw.values().sum()
 
     def _spoof_score(self, book_drop_usd: float, sweep_usd: float) -> float:
         return _sigmoid((book_drop_usd - sweep_usd) / self.cfg.SPOOF_K)
 
     def _update_beta(self):
-        # compute x_t from exch mid
-        if len(self.exch_mid_hist) < 2 or len(self.chainlink_hist) < 2:
-            return
-        now_ms, now_mid = self.exch_mid_hist[-1]
-        target_ms = now_ms - self.cfg.DELTA_MS
-        past_mid = next((p for t, p in reversed(self.exch_mid_hist) if t <= target_ms), None)
-        if past_mid is None:
+        # ratio of the lagged oracle move to the exch mid move over DELTA_MS
+        mid_hist = self.exch_mid_hist
+        cl_hist = self.chainlink_hist
+        if len(mid_hist) < 2 or len(cl_hist) < 2:
             return
-        x = now_mid - past_mid
-        if abs(x) < self.cfg.BETA_X_MIN:
-            return
-        # oracle delta with lag
-        lag_ms = self.cfg.LAG_MS_INIT
-        o_now = next((p for t, p in reversed(self.chainlink_hist) if t <= now_ms + lag_ms), None)
-        o_prev = next((p for t, p in reversed(self.chainlink_hist) if t <= target_ms + lag_ms), None)
-        if o_now is None or o_prev is None:
-            return
-        y = o_now - o_prev
-        ratio = y / x
-        samples = getattr(self, "_beta_samples", deque())
-        samples.append((now_ms, ratio))
-        while samples and now_ms - samples[0][0] > self.cfg.W_BETA_SEC * 1000:
-            samples.popleft()
-        ratios = [r for _, r in samples]
-        if not ratios:
+        ratio = beta_ratio(
+            mid_hist.ts,
+            mid_hist.values(),
+            cl_hist.ts,
+            cl_hist.values(),
+            self.cfg.DELTA_MS,
+            self.cfg.LAG_MS_INIT,
+            self.cfg.BETA_X_MIN,
+        )
+        if math.isnan(ratio):
             return
-        ratios.sort()
-        mid = ratios[len(ratios) // 2]
+        samples = self._beta_samples
+        samples.append(mid_hist.last()[0], ratio)
+        mid = upper_median(samples.values())
         beta_raw = max(self.cfg.BETA_MIN, min(self.cfg.BETA_MAX, mid))
         self.beta_state.beta = (1 - self.cfg.BETA_SMOOTH) * self.beta_state.beta + self.cfg.BETA_SMOOTH * beta_raw
-        self.beta_state.conf = min(1.0, len(ratios) / 30.0)
-        self._beta_samples = samples
+        self.beta_state.conf = min(1.0, len(samples) / 30.0)
 
     def _enter(self, direction: int, chance_price: float, ts_ms: int):
         self.pos_dir = direction
@@ -384,33 +555,24 @@ class ShadowBot:
             self._place_order(direction=None, action="EXIT")
 
     def _latest_chainlink(self) -> Optional[float]:
-        if not self.chainlink_hist:
+        if not len(self.chainlink_hist):
             return None
-        return self.chainlink_hist[-1][1]
+        return self.chainlink_hist.last()[1]
 
     def _place_order(self, direction: Optional[int], action: str) -> None:
         if not self.client or not self.tokens:
             return
-        try:
-            from py_clob_client.clob_types import (
-                BalanceAllowanceParams,
-                MarketOrderArgs,
-                OrderType,
-                AssetType,
-            )
-            from py_clob_client.order_builder.constants import BUY, SELL
-        except Exception as exc:
-            print(f"[WARN] py-clob-client not available: {exc}")
+        if _CLOB_IMPORT_ERROR is not None:
+            print(f"[WARN] py-clob-client not available: {_CLOB_IMPORT_ERROR}")
             return
 
         if action == "ENTER":
             token_id = self.tokens.yes_token_id if direction == 1 else self.tokens.no_token_id
-            order_type = OrderType(self.order_type)
             order_args = MarketOrderArgs(
                 token_id=token_id,
                 amount=self.order_usdc,
                 side=BUY,
-                order_type=order_type,
+                order_type=self._order_type_enum,
             )
             signed = self.client.create_market_order(order_args)
             self.client.post_order(signed, order_args.order_type)
@@ -422,18 +584,17 @@ class ShadowBot:
                 bal = float(resp.get("balance") or 0)
                 if bal <= 0:
                     continue
-                order_type = OrderType(self.order_type)
                 order_args = MarketOrderArgs(
                     token_id=token_id,
                     amount=bal,
                     side=SELL,
-                    order_type=order_type,
+                    order_type=self._order_type_enum,
                 )
                 signed = self.client.create_market_order(order_args)
                 self.client.post_order(signed, order_args.order_type)
 
     async def _set_market(self, slug: str):
-        market = fetch_market_by_slug(slug)
+        market = await _fetch_market_by_slug(self._http, slug)
         tokens = resolve_yes_no_tokens(market, slug)
         async with self._market_lock:
             self.slug = slug
@@ -443,13 +604,25 @@ class ShadowBot:
             self.chainlink_rtds.clear()
 
     async def run(self):
+        # keep-alive session for REST polling and market lookups; requests never block the loop
+        self._http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=3),
+            connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=30),
+            raise_for_status=True,
+        )
+        try:
+            await self._run()
+        finally:
+            await self._http.close()
+
+    async def _run(self):
         if self.auto_slug:
             prefix = self.slug_prefix or (infer_slug_prefix(self.slug or "") if self.slug else None)
             if not prefix:
                 raise SystemExit("Missing --slug-prefix for auto mode.")
             # Epoch-suffix slugs: prefix-<epoch>
             try:
-                market, slug = _find_active_epoch_market(prefix, step_s=900, search_steps=8)
+                market, slug = await _find_active_epoch_market(self._http, prefix, step_s=900, search_steps=8)
             except Exception:
                 now_et = dt.datetime.now(tz=ET_TZ)
                 market, slug = find_active_market_by_time(
@@ -465,7 +638,6 @@ class ShadowBot:
             await self._set_market(self.slug)
 
         async def polymarket_loop():
-            latest = {"yes_bid": None, "yes_ask": None}
             while True:
                 try:
                     async with websockets.connect(PM_WS, ping_interval=20, ping_timeout=20) as ws:
@@ -475,34 +647,12 @@ class ShadowBot:
                             await asyncio.sleep(0.2)
                             continue
                         sub = {"type": "market", "assets_ids": [tokens.yes_token_id, tokens.no_token_id], "custom_feature_enabled": True}
-                        await ws.send(json.dumps(sub))
+                        await ws.send(_json_dumps(sub))
+                        self._pm_sub_tokens = tokens
                         async for raw in ws:
                             if raw == "PONG":
                                 continue
-                            data = json.loads(raw)
-                            events = data if isinstance(data, list) else data.get("data") or [data]
-                            for event in events:
-                                if event.get("event_type") != "best_bid_ask":
-                                    continue
-                                asset_id = event.get("asset_id")
-                                bid = event.get("best_bid")
-                                ask = event.get("best_ask")
-                                if asset_id == tokens.yes_token_id:
-                                    latest["yes_bid"] = float(bid) if bid is not None else None
-                                    latest["yes_ask"] = float(ask) if ask is not None else None
-
-                                if latest["yes_bid"] is not None and latest["yes_ask"] is not None:
-                                    now_ms = int(time.time() * 1000)
-                                    chance = (latest["yes_bid"] + latest["yes_ask"]) / 2.0
-                                    self.pm_quotes.write(
-                                        {
-                                            "ts": utc_iso_from_ms(now_ms),
-                                            "ts_ms": now_ms,
-                                            "chance": chance,
-                                            "yes_bid": latest["yes_bid"],
-                                            "yes_ask": latest["yes_ask"],
-                                        }
-                                    )
+                            await self._msg_q.put(("PM", raw))
                 except Exception:
                     await asyncio.sleep(1)
 
@@ -510,18 +660,17 @@ class ShadowBot:
             rpc = self.rpc or os.environ.get("POLYRPC")
             if not rpc:
                 raise SystemExit("Missing POLYRPC for Chainlink.")
-            w3 = Web3(Web3.HTTPProvider(rpc))
+            # async provider: RPC round trips no longer block the other feeds
+            w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc))
             addr = w3.to_checksum_address(CHAINLINK_FEED)
             c = w3.eth.contract(address=addr, abi=AGGREGATOR_V3_ABI)
-            decimals = int(c.functions.decimals().call())
+            scale = 10 ** int(await c.functions.decimals().call())
             while True:
                 try:
-                    _round_id, answer, _started, updated, _ans = c.functions.latestRoundData().call()
-                    price = float(answer) / (10 ** decimals)
+                    _round_id, answer, _started, updated, _ans = await c.functions.latestRoundData().call()
+                    price = float(answer) / scale
                     now_ms = int(time.time() * 1000)
-                    self.chainlink_hist.append((now_ms, price))
-                    while self.chainlink_hist and now_ms - self.chainlink_hist[0][0] > self.cfg.W_BETA_SEC * 1000:
-                        self.chainlink_hist.popleft()
+                    self.chainlink_hist.append(now_ms, price)
                     self.chainlink.write(
                         {
                             "ts": utc_iso_from_ms(now_ms),
@@ -536,120 +685,145 @@ class ShadowBot:
 
         async def chainlink_rtds_loop():
             # price_to_beat snapshot from RTDS chainlink stream
-            start_ms = None
-
-            def _maybe_set_ptb():
-                if self.ptb_price is not None:
-                    return
-                if not self.chainlink_rtds:
-                    return
-                if start_ms is None:
-                    return
-                before = [x for x in self.chainlink_rtds if x[0] <= start_ms]
-                after = [x for x in self.chainlink_rtds if x[0] >= start_ms]
-                cand = []
-                if before:
-                    cand.append(before[-1])
-                if after:
-                    cand.append(after[0])
-                if not cand:
-                    return
-                best = min(cand, key=lambda x: abs(x[0] - start_ms))
-                self.ptb_ts_ms = best[0]
-                self.ptb_price = best[1]
-
             while True:
                 try:
-                    async with websockets.connect(PM_RTDS_WS, ping_interval=20, ping_timeout=20) as ws:
-                        sub = {"type": "subscribe", "topic": "crypto_prices_chainlink"}
-                    await ws.send(json.dumps(sub))
-                    async for raw in ws:
-                        if raw == "PONG":
-                            continue
-                            try:
-                                msg = json.loads(raw)
-                            except Exception:
-                                continue
-                            payload = msg.get("payload") or msg.get("data") or msg
-                            ts_ms = payload.get("timestamp") or payload.get("ts_ms") or payload.get("ts")
-                            val = payload.get("value") or payload.get("price")
-                            try:
-                                ts_ms = int(ts_ms)
-                                price = float(val)
-                            except Exception:
-                                continue
-                            self.chainlink_rtds.append((ts_ms, price))
-                            while self.chainlink_rtds and ts_ms - self.chainlink_rtds[0][0] > 5_000:
-                                self.chainlink_rtds.popleft()
-                            if start_ms is None:
-                                async with self._market_lock:
-                                    slug = self.slug
-                                epoch = _parse_slug_epoch(slug or "")
-                                if epoch is not None:
-                                    start_ms = epoch * 1000
-                            _maybe_set_ptb()
+                    # RTDS expects a text PING every 5s instead of protocol-level pings
+                    async with websockets.connect(PM_RTDS_WS, ping_interval=None) as ws:
+                        sub = {
+                            "action": "subscribe",
+                            "subscriptions": [
+                                {
+                                    "topic": RTDS_TOPIC,
+                                    "type": "*",
+                                    # filters is itself a JSON string
+                                    "filters": json.dumps({"symbol": RTDS_SYMBOL}),
+                                }
+                            ],
+                        }
+                        await ws.send(_json_dumps(sub))
+
+                        async def ping():
+                            while True:
+                                await asyncio.sleep(RTDS_PING_SEC)
+                                await ws.send("PING")
+
+                        pinger = asyncio.create_task(ping())
+                        try:
+                            async for raw in ws:
+                                if raw == "PONG":
+                                    continue
+                                await self._msg_q.put(("RTDS", raw))
+                        finally:
+                            pinger.cancel()
                 except Exception:
                     await asyncio.sleep(1)
 
         async def binance_loop():
-            while True:
-                try:
-                    async with websockets.connect(BINANCE_WS, ping_interval=20, ping_timeout=20) as ws:
-                        async for raw in ws:
-                            msg = json.loads(raw)
-                            payload = msg.get("data", msg)
-                            if payload.get("e") == "aggTrade":
-                                price = float(payload["p"])
-                                qty = float(payload["q"])
-                                ts_ms = int(payload.get("T") or payload.get("E") or time.time() * 1000)
-                                is_buy = not payload.get("m", False)
-                                self._record_trade("BINANCE", price, qty, ts_ms, is_buy)
-                            else:
-                                is_depth_update = payload.get("e") == "depthUpdate"
-                                bids = payload.get("b") if is_depth_update else payload.get("bids")
-                                asks = payload.get("a") if is_depth_update else payload.get("asks")
-                                if bids is not None and asks is not None:
-                                    bids = bids[: self.cfg.BOOK_TOP_N]
-                                    asks = asks[: self.cfg.BOOK_TOP_N]
-                                    ts_ms = int(payload.get("E") or time.time() * 1000)
-                                    self._update_book("BINANCE", bids, asks, ts_ms)
-                except Exception:
+            # aiohttp's C-accelerated frame reader keeps up with aggTrade bursts better than the
+            # pure-Python websockets client; aggTrade frames are tiny, so no permessage-deflate.
+            async with aiohttp.ClientSession() as session:
+                while True:
+                    try:
+                        async with session.ws_connect(BINANCE_WS, heartbeat=20, compress=0, max_msg_size=2**20) as ws:
+                            async for frame in ws:
+                                if frame.type != aiohttp.WSMsgType.TEXT:
+                                    if frame.type == aiohttp.WSMsgType.ERROR:
+                                        break
+                                    continue
+                                await self._msg_q.put(("BINANCE", frame.data))
+                    except Exception:
+                        pass
                     await asyncio.sleep(1)
 
         async def coinbase_loop():
             while True:
                 try:
-                    with urllib.request.urlopen(COINBASE_TICKER, timeout=5) as resp:
-                        data = json.load(resp)
+                    async with self._http.get(COINBASE_TICKER) as resp:
+                        data = await resp.json(loads=_json_loads)
                     price = float(data.get("price"))
                     ts_ms = int(time.time() * 1000)
                     self._record_trade("COINBASE", price, 0.0, ts_ms, None)
                 except Exception:
                     pass
                 try:
-                    with urllib.request.urlopen(COINBASE_BOOK, timeout=5) as resp:
-                        book = json.load(resp)
-                    bids = book.get("bids", [])[: self.cfg.BOOK_TOP_N]
-                    asks = book.get("asks", [])[: self.cfg.BOOK_TOP_N]
+                    async with self._http.get(COINBASE_BOOK) as resp:
+                        book = await resp.json(loads=_json_loads)
+                    bids = _levels(book.get("bids", []), self.cfg.BOOK_TOP_N)
+                    asks = _levels(book.get("asks", []), self.cfg.BOOK_TOP_N)
                     ts_ms = int(time.time() * 1000)
                     self._update_book("COINBASE", bids, asks, ts_ms)
                 except Exception:
                     pass
+                self._tick_event.set()
                 await asyncio.sleep(1.0)
 
+        async def message_loop():
+            handlers = {
+                "BINANCE": self._on_binance_message,
+                "PM": self._on_pm_message,
+                "RTDS": self._on_rtds_message,
+            }
+            q = self._msg_q
+            while True:
+                # drain what has piled up during a burst and wake the decision loop once for it
+                batch = [await q.get()]
+                while len(batch) < MSG_BATCH and not q.empty():
+                    batch.append(q.get_nowait())
+                for source, raw in batch:
+                    try:
+                        handlers[source](_json_loads(raw))
+                    except Exception:
+                        continue
+                self._tick_event.set()
+
         async def decision_loop():
+            # BotConfig is frozen and these objects live as long as the bot: bind them once so
+            # the per-tick path reads locals; position state (pos_*) is still read from self
+            cfg = self.cfg
+            cooldown_ms = cfg.COOLDOWN_MS
+            delta_ms = cfg.DELTA_MS
+            price_move_min = cfg.PRICE_MOVE_USD_MIN_5S
+            book_consume_min = cfg.BOOK_CONSUME_USD_MIN
+            spoof_max = cfg.SPOOF_SCORE_MAX
+            ptb_cross_eps = cfg.PTB_CROSS_EPS_USD
+            confirm_win_ms = cfg.CONFIRM_WIN_MS
+            confirm_eps = cfg.CONFIRM_EPS_USD
+            time_stop_ms = cfg.TIME_STOP_MS
+            fee_table = self._fee_table
+            exch_mid_hist = self.exch_mid_hist
+            tick_event = self._tick_event
+            signal_buf = self._signal_buf
+            signals = self.signals
+            sleep = asyncio.sleep
+            wait_for = asyncio.wait_for
+            clock = time.time
+            last_decision_ms = 0
             while True:
-                now_ms = int(time.time() * 1000)
-                self._update_beta()
+                try:
+                    await wait_for(tick_event.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                tick_event.clear()
+                now_ms = int(clock() * 1000)
+                wait_ms = DECISION_MIN_MS - (now_ms - last_decision_ms)
+                if wait_ms > 0:
+                    # coalesce a burst of updates into one decision
+                    await sleep(wait_ms / 1000)
+                    tick_event.clear()
+                    now_ms = int(clock() * 1000)
+                last_decision_ms = now_ms
+                if now_ms - self._last_beta_ms >= BETA_UPDATE_MS:
+                    self._update_beta()
+                    self._last_beta_ms = now_ms
 
                 # time gate: monitor from T-180s, trade from T-120s
                 time_to_end = None
                 start_epoch = _parse_slug_epoch(self.slug or "")
                 if start_epoch is not None:
                     end_epoch = start_epoch + 900
-                    time_to_end = end_epoch - int(time.time())
+                    time_to_end = end_epoch - int(clock())
                     if time_to_end > 180:
-                        await asyncio.sleep(0.05)
+                        await sleep(min(5.0, time_to_end - 180))
                         continue
 
                 # choose exchange with larger absolute move
@@ -667,7 +841,9 @@ class ShadowBot:
                 beta_conf = self.beta_state.conf
                 ptb = self.ptb_price
 
-                self.signals.write(
+                self._buffer_row(
+                    signal_buf,
+                    signals,
                     {
                         "ts": utc_iso_from_ms(now_ms),
                         "ts_ms": now_ms,
@@ -678,56 +854,54 @@ class ShadowBot:
                         "beta_conf": beta_conf,
                         "ptb": ptb,
                         "time_to_end": time_to_end,
-                    }
+                    },
                 )
 
-                if self.last_entry_ms and now_ms - self.last_entry_ms < self.cfg.COOLDOWN_MS:
-                    await asyncio.sleep(0.05)
+                if self.last_entry_ms and now_ms - self.last_entry_ms < cooldown_ms:
                     continue
 
                 if time_to_end is not None and time_to_end > 120:
-                    await asyncio.sleep(0.05)
                     continue
 
-                if self.pm_quotes._rows and self.exch_mid_hist:
-                    now_mid = self.exch_mid_hist[-1][1]
-                    target_ms = now_ms - self.cfg.DELTA_MS
-                    past_mid = next((p for t, p in reversed(self.exch_mid_hist) if t <= target_ms), None)
+                chance = self._last_chance
+                if chance is None:
+                    continue
+
+                if len(exch_mid_hist):
+                    _, now_mid = exch_mid_hist.last()
+                    target_ms = now_ms - delta_ms
+                    past_mid = exch_mid_hist.value_at_or_before(target_ms)
                     if past_mid is not None:
                         delta_ex = now_mid - past_mid
                         direction = 1 if delta_ex >= 0 else -1
                         book_drop = self._book_drop_usd(src_ex, direction)
                         spoof = self._spoof_score(book_drop, sweep if sweep > 0 else book_drop)
-                        if abs(price_delta_5s) >= self.cfg.PRICE_MOVE_USD_MIN_5S and book_drop >= self.cfg.BOOK_CONSUME_USD_MIN:
-                            if beta_conf >= 0.2 and spoof <= self.cfg.SPOOF_SCORE_MAX:
-                                chance = self.pm_quotes._rows[-1]["chance"]
-                                est_fee = fee_usdc(chance, self.cfg.SHARES)
+                        if abs(price_delta_5s) >= price_move_min and book_drop >= book_consume_min:
+                            if beta_conf >= 0.2 and spoof <= spoof_max:
+                                est_fee = fee_table[min(10_000, max(0, round(chance * 10_000)))]
                                 if ptb is not None:
                                     o_now = self._latest_chainlink() or 0.0
                                     o_pred = o_now + (beta * delta_ex)
                                     margin_pred = o_pred - ptb
                                     # only trade if predicted move crosses PTB with buffer
-                                    if direction == 1 and margin_pred < self.cfg.PTB_CROSS_EPS_USD:
-                                        await asyncio.sleep(0.05)
+                                    if direction == 1 and margin_pred < ptb_cross_eps:
                                         continue
-                                    if direction == -1 and margin_pred > -self.cfg.PTB_CROSS_EPS_USD:
-                                        await asyncio.sleep(0.05)
+                                    if direction == -1 and margin_pred > -ptb_cross_eps:
                                         continue
                                 if est_fee >= 0:
                                     self._enter(direction, chance, now_ms)
 
-                if self.pos_dir is not None and self.pm_quotes._rows:
-                    chance = self.pm_quotes._rows[-1]["chance"]
+                if self.pos_dir is not None:
                     # confirm window
                     if not self.pos_confirmed and self.pos_entry_ms:
-                        if now_ms - self.pos_entry_ms <= self.cfg.CONFIRM_WIN_MS:
+                        if now_ms - self.pos_entry_ms <= confirm_win_ms:
                             cl_now = self._latest_chainlink()
                             cl_entry = self.pos_entry_chainlink
                             if cl_now is not None and cl_entry is not None:
                                 delta = cl_now - cl_entry
-                                if self.pos_dir == 1 and delta >= self.cfg.CONFIRM_EPS_USD:
+                                if self.pos_dir == 1 and delta >= confirm_eps:
                                     self.pos_confirmed = True
-                                if self.pos_dir == -1 and delta <= -self.cfg.CONFIRM_EPS_USD:
+                                if self.pos_dir == -1 and delta <= -confirm_eps:
                                     self.pos_confirmed = True
                             if not self.pos_confirmed and self.ptb_price is not None and cl_now is not None:
                                 margin = cl_now - self.ptb_price
@@ -737,26 +911,34 @@ class ShadowBot:
                                     self.pos_confirmed = True
                         else:
                             self._exit("confirm_fail", chance, now_ms)
-                    if self.pos_entry_ms and now_ms - self.pos_entry_ms > self.cfg.TIME_STOP_MS:
+                    if self.pos_entry_ms and now_ms - self.pos_entry_ms > time_stop_ms:
                         self._exit("time_stop", chance, now_ms)
-                await asyncio.sleep(0.05)
+
+        async def row_buffer_loop():
+            while True:
+                await asyncio.sleep(ROW_BATCH_FLUSH_SEC)
+                self._flush_row_buffers()
 
         async def market_refresh_loop():
             if not self.auto_slug:
                 return
+            slug_prefix = self.slug_prefix
+            search_hours = self.search_hours
+            step_hours = self.search_step_hours
+            market_lock = self._market_lock
             while True:
                 try:
                     try:
-                        market, slug = _find_active_epoch_market(self.slug_prefix, step_s=900, search_steps=8)
+                        market, slug = await _find_active_epoch_market(self._http, slug_prefix, step_s=900, search_steps=8)
                     except Exception:
                         now_et = dt.datetime.now(tz=ET_TZ)
                         market, slug = find_active_market_by_time(
-                            self.slug_prefix,
+                            slug_prefix,
                             now_et=now_et,
-                            search_hours=self.search_hours,
-                            step_hours=self.search_step_hours,
+                            search_hours=search_hours,
+                            step_hours=step_hours,
                         )
-                    async with self._market_lock:
+                    async with market_lock:
                         cur = self.slug
                     if slug and slug != cur:
                         await self._set_market(slug)
@@ -765,15 +947,17 @@ class ShadowBot:
                     pass
                 await asyncio.sleep(5)
 
-        await asyncio.gather(
-            polymarket_loop(),
-            chainlink_loop(),
-            chainlink_rtds_loop(),
-            binance_loop(),
-            coinbase_loop(),
-            decision_loop(),
-            market_refresh_loop(),
-        )
+        # an unhandled error in any loop cancels the others instead of leaving them running
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(polymarket_loop(), name="polymarket")
+            tg.create_task(chainlink_loop(), name="chainlink")
+            tg.create_task(chainlink_rtds_loop(), name="chainlink_rtds")
+            tg.create_task(binance_loop(), name="binance")
+            tg.create_task(coinbase_loop(), name="coinbase")
+            tg.create_task(decision_loop(), name="decision")
+            tg.create_task(market_refresh_loop(), name="market_refresh")
+            tg.create_task(row_buffer_loop(), name="row_buffer")
+            tg.create_task(message_loop(), name="message")
 
 
 def main() -> None:
@@ -836,7 +1020,10 @@ def main() -> None:
         else:
             client.set_api_creds(client.create_or_derive_api_creds())
         bot.client = client
-    asyncio.run(bot.run())
+    if uvloop is not None:
+        uvloop.run(bot.run())
+    else:
+        asyncio.run(bot.run())
 
 
 if __name__ == "__main__":
@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
 from typing import Any
 
+from msgspec import Struct
 
-@dataclass
-class Event:
+
+class Event(Struct):
     type: str
     payload: Any
 
@@ -14,10 +14,29 @@ class Event:
 class EventBus:
     def __init__(self, maxsize: int = 10_000) -> None:
         self._queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
 
     async def publish(self, event: Event) -> None:
         await self._queue.put(event)
 
+    def publish_nowait(self, event: Event) -> None:
+        """Enqueue without awaiting; when the queue is full the oldest event is dropped."""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._queue.get_nowait()
+            self.dropped += 1
+            self._queue.put_nowait(event)
+
     async def next(self) -> Event:
         return await self._queue.get()
 
+    async def drain(self, max_n: int = 256) -> list[Event]:
+        """Wait for one event, then take whatever else is already queued, up to max_n."""
+        queue = self._queue
+        events = [await queue.get()]
+        get_nowait = queue.get_nowait
+        while len(events) < max_n and not queue.empty():
+            events.append(get_nowait())
+        return events
+
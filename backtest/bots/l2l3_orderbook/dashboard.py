@@ -1,8 +1,12 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import time
 
 import plotly.express as px
@@ -10,6 +14,7 @@ import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[2]
 BASE_DIR = ROOT / "src/out/l2l3_orderbook"
+BOOK_COLUMNS = ["ts_ms", "venue", "best_bid", "best_ask", "bids", "asks", "l3_order_count"]
 
 st.set_page_config(page_title="L2/L3 Orderbook Monitor", layout="wide")
 
@@ -46,21 +51,81 @@ def _pick_default_session(base_dir: Path, sessions: list[str]) -> str:
     return sessions[-1]
 
 
-def _read_parquet(glob_dir: Path, prefix: str) -> pd.DataFrame:
+@st.cache_resource
+def _table_cache() -> dict[tuple[str, tuple[str, ...]], tuple[float, pa.Table]]:
+    """(path, columns) -> (mtime, table); survives reruns, so only windows still being written
+    are read again. Arrow tables are immutable, which makes sharing them across reruns safe."""
+    return {}
+
+
+def _read_table(path: Path, columns: tuple[str, ...]) -> pa.Table | None:
+    try:
+        pf = pq.ParquetFile(path, pre_buffer=True)
+        names = pf.schema_arrow.names
+        return pf.read(columns=[c for c in columns if c in names], use_threads=False)
+    except Exception:
+        # most likely a window file caught mid-write; its mtime changes once the write completes
+        return None
+
+
+def _read_parquet(glob_dir: Path, prefix: str, columns: list[str]) -> pa.Table | None:
     if not glob_dir.exists():
-        return pd.DataFrame()
+        return None
     paths = sorted(glob_dir.glob(f"{prefix}_*.parquet"))
     if not paths:
-        return pd.DataFrame()
-    frames = []
+        return None
+    cols = tuple(columns)
+    cache = _table_cache()
+    tables: dict[Path, pa.Table] = {}
+    stale: list[tuple[Path, float]] = []
     for p in paths[-400:]:
         try:
-            frames.append(pd.read_parquet(p))
-        except Exception:
+            mtime = p.stat().st_mtime
+        except OSError:
             continue
-    if not frames:
+        hit = cache.get((str(p), cols))
+        if hit is not None and hit[0] == mtime:
+            tables[p] = hit[1]
+        else:
+            stale.append((p, mtime))
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(8, len(stale))) as pool:
+            fresh = list(pool.map(lambda item: _read_table(item[0], cols), stale))
+        for (p, mtime), table in zip(stale, fresh):
+            if table is not None:
+                cache[(str(p), cols)] = (mtime, table)
+                tables[p] = table
+    if len(cache) > 2 * len(paths) + 400:
+        wanted = {(str(p), cols) for p in tables}
+        for key in [k for k in cache if k not in wanted]:
+            cache.pop(key, None)
+    if not tables:
+        return None
+    # promote: l3_order_count is an all-null column in windows without Coinbase L3 rows
+    return pa.concat_tables([tables[p] for p in sorted(tables)], promote_options="default")
+
+
+def _books_frame(table: pa.Table | None) -> pd.DataFrame:
+    """Derive ts/mid/spread on the Arrow table and convert to pandas once."""
+    if table is None or table.num_rows == 0:
         return pd.DataFrame()
-    return pd.concat(frames, ignore_index=True)
+    bid = table["best_bid"]
+    ask = table["best_ask"]
+    table = (
+        table.append_column("ts", pc.cast(table["ts_ms"], pa.timestamp("ms", tz="UTC")))
+        .append_column("mid", pc.divide(pc.add(bid, ask), 2.0))
+        .append_column("spread", pc.subtract(ask, bid))
+    )
+    return table.to_pandas(split_blocks=True)
+
+
+def _levels(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        # sessions recorded before bids/asks were stored as typed list<struct> columns
+        return json.loads(value)
+    return [(lv["price"], lv["size"]) for lv in value]
 
 
 def _latest_parquet(glob_dir: Path, prefix: str) -> Path | None:
@@ -72,17 +137,6 @@ def _latest_parquet(glob_dir: Path, prefix: str) -> Path | None:
     return max(paths, key=lambda p: p.stat().st_mtime)
 
 
-def _best_levels(row) -> tuple[float | None, float | None]:
-    try:
-        bids = json.loads(row["bids"])
-        asks = json.loads(row["asks"])
-        if not bids or not asks:
-            return None, None
-        return float(bids[0][0]), float(asks[0][0])
-    except Exception:
-        return None, None
-
-
 st.title("L2/L3 Orderbook Monitor")
 
 if not BASE_DIR.exists():
@@ -104,19 +158,12 @@ auto_refresh = st.sidebar.checkbox("Auto refresh", value=True)
 refresh_sec = st.sidebar.number_input("Refresh seconds", min_value=0.5, max_value=10.0, value=1.0, step=0.5)
 
 session_dir = BASE_DIR / sel
-books = _read_parquet(session_dir, "book_states")
+books = _books_frame(_read_parquet(session_dir, "book_states", BOOK_COLUMNS))
 latest_file = _latest_parquet(session_dir, "book_states")
 
 if books.empty:
     st.info("No orderbook data found.")
 else:
-    books["ts"] = pd.to_datetime(books["ts_ms"], unit="ms", utc=True, errors="coerce")
-    best = books.apply(_best_levels, axis=1, result_type="expand")
-    books["best_bid"] = best[0]
-    books["best_ask"] = best[1]
-    books["mid"] = (books["best_bid"] + books["best_ask"]) / 2.0
-    books["spread"] = books["best_ask"] - books["best_bid"]
-
     st.subheader("Orderbook (latest snapshot)")
     if latest_file is not None:
         mtime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(latest_file.stat().st_mtime))
@@ -129,8 +176,8 @@ else:
             continue
         row = latest.iloc[0]
         try:
-            bids = json.loads(row["bids"])
-            asks = json.loads(row["asks"])
+            bids = _levels(row["bids"])
+            asks = _levels(row["asks"])
         except Exception:
             bids, asks = [], []
         depth = min(10, len(bids), len(asks))
@@ -147,8 +194,10 @@ else:
         with col2:
             st.caption("Asks (top)")
             st.dataframe(ask_df, width="stretch")
-        if "l3_order_count" in books.columns:
-            st.caption(f"L3 order count: {int(row.get('l3_order_count') or 0)}")
+        # null (NaN once in pandas) for L2 rows: Binance, or Coinbase on the REST fallback
+        l3_count = row.get("l3_order_count")
+        if l3_count is not None and not pd.isna(l3_count):
+            st.caption(f"L3 order count: {int(l3_count)}")
 
     st.subheader("Mid + Spread")
     fig_mid = px.line(books, x="ts", y="mid", color="venue")
@@ -4,11 +4,13 @@ import asyncio
 import json
 import logging
 import time
-import urllib.request
 from dataclasses import dataclass
+from itertools import islice
 from typing import Any
 
+import aiohttp
 import websockets
+from sortedcontainers import SortedDict
 
 from ..bus import Event, EventBus
 from ..models import BookState
@@ -16,6 +18,35 @@ from ..models import BookState
 BINANCE_REST = "https://api.binance.com/api/v3/depth"
 LOG = logging.getLogger(__name__)
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+def _apply_levels(side: SortedDict, levels: list, price_scale: int) -> None:
+    """Apply one side of a depthUpdate: qty 0 removes the price level, anything else sets it."""
+    # most levels in a 100ms update are size changes, so the setitem branch comes first
+    set_level = side.__setitem__
+    pop_level = side.pop
+    for p, q in levels:
+        qty = float(q)
+        if qty != 0.0:
+            set_level(int(float(p) * price_scale + 0.5), qty)
+        else:
+            pop_level(int(float(p) * price_scale + 0.5), None)
+
+
+def _depth_event(raw: str | bytes) -> dict[str, Any] | None:
+    msg = _json_loads(raw)
+    if isinstance(msg, dict) and isinstance(msg.get("data"), dict):
+        msg = msg["data"]
+    if not isinstance(msg, dict) or msg.get("e") != "depthUpdate":
+        return None
+    return msg
+
 
 @dataclass
 class BinanceL2BookBuilder:
@@ -26,155 +57,137 @@ class BinanceL2BookBuilder:
     ws_url: str | None = None
     resync_backoff: float = 1.0
     emit_full: bool = False
+    # prices are keyed as int(price * price_scale); 100 covers a 0.01 tick
+    price_scale: int = 100
 
     def __post_init__(self) -> None:
         if self.ws_url is None:
             stream = f"{self.symbol.lower()}@depth@100ms"
             self.ws_url = f"wss://stream.binance.com:9443/ws/{stream}"
-        self.bids: dict[float, float] = {}
-        self.asks: dict[float, float] = {}
+        # price-ordered sides: top-of-book is a slice from the right end, no per-emit sort
+        self.bids: SortedDict[int, float] = SortedDict()
+        self.asks: SortedDict[int, float] = SortedDict()
         self.book_update_id: int = 0
         self._resync_count = 0
         self._last_event_ts = 0
+        # top-N levels of the last emitted state; most depth updates only touch deeper levels
+        self._last_top: tuple[list, list] | None = None
+        # kept for the builder's lifetime so resync snapshots reuse the pooled TLS connection
+        self._http: aiohttp.ClientSession | None = None
 
     async def start(self, stop_evt: asyncio.Event) -> None:
-        while not stop_evt.is_set():
-            try:
-                await self._run_once(stop_evt)
-            except Exception:
-                self._resync_count += 1
-                LOG.warning("binance_l2 resync #%d", self._resync_count)
-                await asyncio.sleep(self.resync_backoff)
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        try:
+            while not stop_evt.is_set():
+                try:
+                    await self._run_once(stop_evt)
+                except Exception:
+                    self._resync_count += 1
+                    LOG.warning("binance_l2 resync #%d", self._resync_count)
+                    await asyncio.sleep(self.resync_backoff)
+        finally:
+            await self._http.close()
 
     async def _run_once(self, stop_evt: asyncio.Event) -> None:
         self.bids.clear()
         self.asks.clear()
         self.book_update_id = 0
-        event_q: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
-        first_u: int | None = None
-        buffered: list[dict[str, Any]] = []
+        self._last_top = None
+
+        # max_queue=None: frames that arrive while the snapshot is fetched are held by the
+        # connection and replayed by the loop below, none are dropped or back-pressured.
+        # Depth diffs are small JSON, so permessage-deflate only adds an inflate per frame.
+        async with websockets.connect(
+            self.ws_url,
+            ping_interval=20,
+            ping_timeout=20,
+            max_queue=None,
+            compression=None,
+            max_size=2**20,
+        ) as ws:
+            first: dict[str, Any] | None = None
+            async for raw in ws:
+                first = _depth_event(raw)
+                if first is not None or stop_evt.is_set():
+                    break
+            if first is None:
+                return
+            snapshot = await self._fetch_snapshot()
+            if not snapshot:
+                return
+            last_id = snapshot["lastUpdateId"]
+            while last_id < first["U"]:
+                snapshot = await self._fetch_snapshot()
+                if not snapshot:
+                    return
+                last_id = snapshot["lastUpdateId"]
+
+            self._load_snapshot(snapshot)
+            self.book_update_id = last_id
+            if first["u"] > last_id:
+                self._apply_event(first)
+                self.book_update_id = first["u"]
 
-        async def _receiver(ws) -> None:
-            nonlocal first_u
+            # depthUpdate always carries integer U/u; once u > last id, any U past last+1 is a gap
+            apply_event = self._apply_event
+            emit_state = self._emit_state
             async for raw in ws:
-                msg = json.loads(raw)
-                event = msg
-                if "data" in msg and isinstance(msg["data"], dict):
-                    event = msg["data"]
-                if not isinstance(event, dict):
+                if stop_evt.is_set():
+                    return
+                event = _depth_event(raw)
+                if event is None:
                     continue
-                if event.get("e") != "depthUpdate":
+                u = event["u"]
+                if u <= self.book_update_id:
                     continue
-                if first_u is None:
-                    try:
-                        first_u = int(event.get("U") or 0)
-                    except Exception:
-                        first_u = 0
-                await event_q.put(event)
-
-        async with websockets.connect(self.ws_url, ping_interval=20, ping_timeout=20) as ws:
-            recv_task = asyncio.create_task(_receiver(ws))
-            try:
-                while first_u is None and not stop_evt.is_set():
-                    await asyncio.sleep(0.01)
-                snapshot = self._fetch_snapshot()
-                if not snapshot:
-                    return
-                last_id = int(snapshot["lastUpdateId"])
-                while first_u is not None and last_id < first_u:
-                    snapshot = self._fetch_snapshot()
-                    if not snapshot:
-                        return
-                    last_id = int(snapshot["lastUpdateId"])
-
-                self._load_snapshot(snapshot)
-                self.book_update_id = last_id
-
-                while not event_q.empty():
-                    buffered.append(event_q.get_nowait())
-
-                applied = False
-                for event in buffered:
-                    u = int(event.get("u") or 0)
-                    U = int(event.get("U") or 0)
-                    if u <= self.book_update_id:
-                        continue
-                    if U <= self.book_update_id + 1 <= u:
-                        self._apply_event(event)
-                        self.book_update_id = u
-                        applied = True
-                    elif U > self.book_update_id + 1:
-                        raise RuntimeError("binance_l2_gap")
-
-                if not applied:
-                    while True:
-                        event = await event_q.get()
-                        u = int(event.get("u") or 0)
-                        U = int(event.get("U") or 0)
-                        if u <= self.book_update_id:
-                            continue
-                        if U <= self.book_update_id + 1 <= u:
-                            self._apply_event(event)
-                            self.book_update_id = u
-                            break
-                        if U > self.book_update_id + 1:
-                            raise RuntimeError("binance_l2_gap")
-
-                while not stop_evt.is_set():
-                    event = await event_q.get()
-                    u = int(event.get("u") or 0)
-                    U = int(event.get("U") or 0)
-                    if u <= self.book_update_id:
-                        continue
-                    if U > self.book_update_id + 1:
-                        raise RuntimeError("binance_l2_gap")
-                    self._apply_event(event)
-                    self.book_update_id = u
-                    self._emit_state(event.get("E"))
-            finally:
-                recv_task.cancel()
-
-    def _fetch_snapshot(self) -> dict[str, Any] | None:
+                if event["U"] > self.book_update_id + 1:
+                    raise RuntimeError("binance_l2_gap")
+                apply_event(event)
+                self.book_update_id = u
+                emit_state(event.get("E"))
+
+    async def _fetch_snapshot(self) -> dict[str, Any] | None:
         url = f"{BINANCE_REST}?symbol={self.symbol}&limit={self.depth_limit}"
         try:
-            with urllib.request.urlopen(url, timeout=5) as resp:
-                return json.load(resp)
+            async with self._http.get(url) as resp:
+                resp.raise_for_status()
+                return _json_loads(await resp.read())
         except Exception:
             LOG.warning("binance_l2 snapshot fetch failed")
             return None
 
     def _load_snapshot(self, snap: dict[str, Any]) -> None:
-        self.bids = {float(p): float(q) for p, q in snap.get("bids", []) if float(q) > 0.0}
-        self.asks = {float(p): float(q) for p, q in snap.get("asks", []) if float(q) > 0.0}
+        # built straight from (key, qty) pairs: no intermediate dict, and each qty parsed once
+        scale = self.price_scale
+        self.bids = SortedDict(
+            [(int(float(p) * scale + 0.5), qty) for p, q in snap.get("bids", []) if (qty := float(q)) > 0.0]
+        )
+        self.asks = SortedDict(
+            [(int(float(p) * scale + 0.5), qty) for p, q in snap.get("asks", []) if (qty := float(q)) > 0.0]
+        )
 
     def _apply_event(self, event: dict[str, Any]) -> None:
         self._last_event_ts = int(event.get("E") or time.time() * 1000)
-        for p, q in event.get("b", []):
-            price = float(p)
-            qty = float(q)
-            if qty == 0.0:
-                self.bids.pop(price, None)
-            else:
-                self.bids[price] = qty
-        for p, q in event.get("a", []):
-            price = float(p)
-            qty = float(q)
-            if qty == 0.0:
-                self.asks.pop(price, None)
-            else:
-                self.asks[price] = qty
+        scale = self.price_scale
+        _apply_levels(self.bids, event["b"], scale)
+        _apply_levels(self.asks, event["a"], scale)
 
     def _top_levels(self) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
-        bids = sorted(self.bids.items(), key=lambda x: x[0], reverse=True)[: self.top_n]
-        asks = sorted(self.asks.items(), key=lambda x: x[0])[: self.top_n]
+        scale = self.price_scale
+        bids = [(k / scale, self.bids[k]) for k in islice(reversed(self.bids), self.top_n)]
+        asks = [(k / scale, q) for k, q in islice(self.asks.items(), self.top_n)]
         return bids, asks
 
     def _emit_state(self, ts_exchange_ms: int | None) -> None:
         if self.emit_full:
-            bids = sorted(self.bids.items(), key=lambda x: x[0], reverse=True)
-            asks = sorted(self.asks.items(), key=lambda x: x[0])
+            scale = self.price_scale
+            bids = [(k / scale, q) for k, q in reversed(self.bids.items())]
+            asks = [(k / scale, q) for k, q in self.asks.items()]
         else:
             bids, asks = self._top_levels()
+            if (bids, asks) == self._last_top:
+                return
+            self._last_top = (bids, asks)
         if not bids or not asks:
             return
         if ts_exchange_ms is None:
@@ -190,4 +203,4 @@ class BinanceL2BookBuilder:
             bids=bids,
             asks=asks,
         )
-        asyncio.create_task(self.bus.publish(Event(type="book_state", payload=state)))
+        self.bus.publish_nowait(Event(type="book_state", payload=state))
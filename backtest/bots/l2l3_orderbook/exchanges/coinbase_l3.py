@@ -5,11 +5,13 @@ import datetime as dt
 import json
 import logging
 import time
-import urllib.request
 from dataclasses import dataclass
+from itertools import islice
 from typing import Any
 
+import aiohttp
 import websockets
+from sortedcontainers import SortedDict
 
 from ..bus import Event, EventBus
 from ..models import BookState
@@ -17,6 +19,14 @@ from ..models import BookState
 COINBASE_WS = "wss://ws-feed.exchange.coinbase.com"
 COINBASE_REST = "https://api.exchange.coinbase.com/products"
 LOG = logging.getLogger(__name__)
+_SKIP_TYPES = frozenset({"subscriptions", "heartbeat"})
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 
 @dataclass
@@ -26,138 +36,151 @@ class CoinbaseL3BookBuilder:
     bus: EventBus
     resync_backoff: float = 1.0
     allow_l2_fallback: bool = True
+    # prices are keyed as int(price * price_scale); 100 covers a 0.01 tick
+    price_scale: int = 100
 
     def __post_init__(self) -> None:
-        self.orders: dict[str, dict[str, Any]] = {}
-        self.levels: dict[str, dict[float, float]] = {"buy": {}, "sell": {}}
+        # order_id -> (side, price key); each level maps its resting order ids to their sizes
+        self.orders: dict[str, tuple[str, int]] = {}
+        self.levels: dict[str, SortedDict[int, dict[str, float]]] = {"buy": SortedDict(), "sell": SortedDict()}
         self.last_sequence: int = 0
         self._resync_count = 0
         self._snapshot_failures = 0
+        # top-N levels of the last emitted state; most L3 messages only touch deeper levels
+        self._last_top: tuple[list, list] | None = None
+        # kept for the builder's lifetime so resync snapshots reuse the pooled TLS connection
+        self._http: aiohttp.ClientSession | None = None
 
     async def start(self, stop_evt: asyncio.Event) -> None:
-        while not stop_evt.is_set():
-            try:
-                await self._run_once(stop_evt)
-            except Exception:
-                self._resync_count += 1
-                LOG.warning("coinbase_l3 resync #%d", self._resync_count)
-                await asyncio.sleep(self.resync_backoff)
+        self._http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=5),
+            headers={
+                "User-Agent": "l2l3-orderbook",
+                "Accept": "application/json",
+            },
+        )
+        try:
+            while not stop_evt.is_set():
+                try:
+                    await self._run_once(stop_evt)
+                except Exception:
+                    self._resync_count += 1
+                    LOG.warning("coinbase_l3 resync #%d", self._resync_count)
+                    await asyncio.sleep(self.resync_backoff)
+        finally:
+            await self._http.close()
 
     async def _run_once(self, stop_evt: asyncio.Event) -> None:
         self.orders.clear()
-        self.levels = {"buy": {}, "sell": {}}
+        self.levels = {"buy": SortedDict(), "sell": SortedDict()}
         self.last_sequence = 0
-        event_q: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
-
-        async def _receiver(ws) -> None:
-            async for raw in ws:
-                msg = json.loads(raw)
-                if not isinstance(msg, dict):
-                    continue
-                if msg.get("type") in {"subscriptions", "heartbeat"}:
-                    continue
-                await event_q.put(msg)
+        self._last_top = None
 
-        async with websockets.connect(COINBASE_WS, ping_interval=20, ping_timeout=20) as ws:
+        # max_queue=None: the full channel keeps streaming while the L3 snapshot downloads, and
+        # those frames must be held by the connection, not back-pressured, until we read them.
+        # Each L3 message is a few hundred bytes; permessage-deflate is not worth an inflate each.
+        async with websockets.connect(
+            COINBASE_WS,
+            ping_interval=20,
+            ping_timeout=20,
+            max_queue=None,
+            compression=None,
+            max_size=2**20,
+        ) as ws:
             sub = {"type": "subscribe", "product_ids": [self.product_id], "channels": ["full"]}
             await ws.send(json.dumps(sub))
-            recv_task = asyncio.create_task(_receiver(ws))
-            try:
-                snapshot = self._fetch_snapshot()
-                if not snapshot:
-                    self._snapshot_failures += 1
-                    if self.allow_l2_fallback and self._snapshot_failures >= 3:
-                        LOG.warning("coinbase_l3 snapshot failed 3x; switching to REST L2 fallback")
-                        await self._run_rest_only(stop_evt)
-                        return
-                    raise RuntimeError("coinbase_l3_snapshot_failed")
-                snap_seq = int(snapshot.get("sequence") or 0)
-                self._load_snapshot(snapshot)
-                self.last_sequence = snap_seq
-
-                buffered: list[dict[str, Any]] = []
-                while not event_q.empty():
-                    buffered.append(event_q.get_nowait())
+            snapshot = await self._fetch_snapshot()
+            if not snapshot:
+                self._snapshot_failures += 1
+                if self.allow_l2_fallback and self._snapshot_failures >= 3:
+                    LOG.warning("coinbase_l3 snapshot failed 3x; switching to REST L2 fallback")
+                    await ws.close()
+                    await self._run_rest_only(stop_evt)
+                    return
+                raise RuntimeError("coinbase_l3_snapshot_failed")
+            snap_seq = snapshot.get("sequence", 0)
+            self._load_snapshot(snapshot)
+            self.last_sequence = snap_seq
 
-                for msg in buffered:
-                    seq = int(msg.get("sequence") or 0)
-                    if seq <= self.last_sequence:
-                        continue
-                    self._apply_message(msg)
-                    self.last_sequence = seq
-                    self._emit_state(msg.get("time"))
-
-                while not stop_evt.is_set():
-                    msg = await event_q.get()
-                    seq = int(msg.get("sequence") or 0)
-                    if seq <= self.last_sequence:
-                        continue
-                    if seq > self.last_sequence + 1:
-                        raise RuntimeError("coinbase_seq_gap")
-                    self._apply_message(msg)
-                    self.last_sequence = seq
-                    self._emit_state(msg.get("time"))
-            finally:
-                recv_task.cancel()
+            # feed sequence numbers arrive as JSON ints; messages without one are skipped.
+            # The first message past the snapshot bridges it, gaps are checked from then on.
+            apply_message = self._apply_message
+            emit_state = self._emit_state
+            bridged = False
+            async for raw in ws:
+                if stop_evt.is_set():
+                    return
+                msg = _json_loads(raw)
+                if not isinstance(msg, dict) or msg.get("type") in _SKIP_TYPES:
+                    continue
+                seq = msg.get("sequence", 0)
+                if seq <= self.last_sequence:
+                    continue
+                if bridged and seq > self.last_sequence + 1:
+                    raise RuntimeError("coinbase_seq_gap")
+                bridged = True
+                apply_message(msg)
+                self.last_sequence = seq
+                emit_state(msg.get("time"))
 
-    def _fetch_snapshot(self) -> dict[str, Any] | None:
+    async def _fetch_snapshot(self) -> dict[str, Any] | None:
         url = f"{COINBASE_REST}/{self.product_id}/book?level=3"
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "l2l3-orderbook",
-                "Accept": "application/json",
-            },
-        )
         try:
-            with urllib.request.urlopen(req, timeout=5) as resp:
-                return json.load(resp)
+            async with self._http.get(url) as resp:
+                resp.raise_for_status()
+                return _json_loads(await resp.read())
         except Exception as exc:
             LOG.warning("coinbase_l3 snapshot fetch failed: %s", exc)
             return None
 
-    def _fetch_snapshot_l2(self) -> dict[str, Any] | None:
+    async def _fetch_snapshot_l2(self) -> dict[str, Any] | None:
         url = f"{COINBASE_REST}/{self.product_id}/book?level=2"
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "l2l3-orderbook",
-                "Accept": "application/json",
-            },
-        )
         try:
-            with urllib.request.urlopen(req, timeout=5) as resp:
-                return json.load(resp)
+            async with self._http.get(url) as resp:
+                resp.raise_for_status()
+                return _json_loads(await resp.read())
         except Exception as exc:
             LOG.warning("coinbase_l2 snapshot fetch failed: %s", exc)
             return None
 
     def _load_snapshot(self, snap: dict[str, Any]) -> None:
-        self.orders.clear()
-        self.levels = {"buy": {}, "sell": {}}
-        for price, size, order_id in snap.get("bids", []):
-            self._add_order(order_id, "buy", float(price), float(size))
-        for price, size, order_id in snap.get("asks", []):
-            self._add_order(order_id, "sell", float(price), float(size))
+        # levels are grouped in plain dicts first and each side is sorted once, instead of
+        # inserting every new price into the SortedDict in turn
+        scale = self.price_scale
+        orders: dict[str, tuple[str, int]] = {}
+        for side, rows in (("buy", snap.get("bids", [])), ("sell", snap.get("asks", []))):
+            book: dict[int, dict[str, float]] = {}
+            for price, size, order_id in rows:
+                key = int(float(price) * scale + 0.5)
+                level = book.get(key)
+                if level is None:
+                    level = book[key] = {}
+                level[order_id] = float(size)
+                orders[order_id] = (side, key)
+            self.levels[side] = SortedDict(book)
+        self.orders = orders
 
-    def _add_order(self, order_id: str, side: str, price: float, size: float) -> None:
-        self.orders[order_id] = {"side": side, "price": price, "size": size}
-        level = self.levels[side]
-        level[price] = level.get(price, 0.0) + size
+    def _add_order(self, order_id: str, side: str, price: int, size: float) -> None:
+        """price is the scaled int level key, see price_scale."""
+        self.orders[order_id] = (side, price)
+        levels = self.levels[side]
+        level = levels.get(price)
+        if level is None:
+            level = levels[price] = {}
+        level[order_id] = size
 
     def _remove_order(self, order_id: str) -> None:
-        order = self.orders.pop(order_id, None)
-        if not order:
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
             return
-        side = order["side"]
-        price = order["price"]
-        size = order["size"]
-        level = self.levels[side]
-        new_size = level.get(price, 0.0) - size
-        if new_size <= 0:
-            level.pop(price, None)
-        else:
-            level[price] = new_size
+        side, price = entry
+        levels = self.levels[side]
+        level = levels.get(price)
+        if level is None:
+            return
+        level.pop(order_id, None)
+        if not level:
+            del levels[price]
 
     def _apply_message(self, msg: dict[str, Any]) -> None:
         mtype = msg.get("type")
@@ -169,26 +192,24 @@ class CoinbaseL3BookBuilder:
             price = msg.get("price")
             size = msg.get("remaining_size") or msg.get("size")
             if order_id and side and price and size:
-                self._add_order(order_id, side, float(price), float(size))
+                self._add_order(order_id, side, int(float(price) * self.price_scale + 0.5), float(size))
             return
         if mtype == "match":
             order_id = msg.get("maker_order_id")
             size = msg.get("size")
             if not order_id or size is None:
                 return
-            order = self.orders.get(order_id)
-            if not order:
+            entry = self.orders.get(order_id)
+            if entry is None:
                 return
+            side, price = entry
+            level = self.levels[side][price]
             trade_size = float(size)
-            prev_size = float(order["size"])
+            prev_size = level[order_id]
             if trade_size >= prev_size:
                 self._remove_order(order_id)
             else:
-                order["size"] = prev_size - trade_size
-                side = order["side"]
-                price = order["price"]
-                level = self.levels[side]
-                level[price] = max(0.0, level.get(price, 0.0) - trade_size)
+                level[order_id] = prev_size - trade_size
             return
         if mtype == "done":
             order_id = msg.get("order_id")
@@ -200,26 +221,30 @@ class CoinbaseL3BookBuilder:
             new_size = msg.get("new_size")
             if not order_id or new_size is None:
                 return
-            order = self.orders.get(order_id)
-            if not order:
+            entry = self.orders.get(order_id)
+            if entry is None:
                 return
-            if float(new_size) <= 0:
+            size = float(new_size)
+            if size <= 0:
                 self._remove_order(order_id)
                 return
-            side = order["side"]
-            price = order["price"]
-            level = self.levels[side]
-            delta = float(new_size) - order["size"]
-            level[price] = max(0.0, level.get(price, 0.0) + delta)
-            order["size"] = float(new_size)
+            side, price = entry
+            self.levels[side][price][order_id] = size
 
     def _top_levels(self) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
-        bids = sorted(self.levels["buy"].items(), key=lambda x: x[0], reverse=True)[: self.top_n]
-        asks = sorted(self.levels["sell"].items(), key=lambda x: x[0])[: self.top_n]
+        # level size is summed from its resting orders on read, never kept as a running total
+        scale = self.price_scale
+        buy = self.levels["buy"]
+        sell = self.levels["sell"]
+        bids = [(k / scale, sum(buy[k].values())) for k in islice(reversed(buy), self.top_n)]
+        asks = [(k / scale, sum(sell[k].values())) for k in islice(sell, self.top_n)]
         return bids, asks
 
     def _emit_state(self, ts_exchange: str | None) -> None:
         bids, asks = self._top_levels()
+        if (bids, asks) == self._last_top:
+            return
+        self._last_top = (bids, asks)
         if not bids or not asks:
             return
         ts_ms = None
@@ -243,7 +268,7 @@ class CoinbaseL3BookBuilder:
             asks=asks,
             l3_order_count=len(self.orders),
         )
-        asyncio.create_task(self.bus.publish(Event(type="book_state", payload=state)))
+        self.bus.publish_nowait(Event(type="book_state", payload=state))
 
     def _emit_state_l2(self, bids: list[list[str]], asks: list[list[str]]) -> None:
         top_bids = [(float(p), float(q)) for p, q, *_ in bids[: self.top_n]]
@@ -263,11 +288,11 @@ class CoinbaseL3BookBuilder:
             asks=top_asks,
             l3_order_count=None,
         )
-        asyncio.create_task(self.bus.publish(Event(type="book_state", payload=state)))
+        self.bus.publish_nowait(Event(type="book_state", payload=state))
 
     async def _run_rest_only(self, stop_evt: asyncio.Event) -> None:
         while not stop_evt.is_set():
-            snap = self._fetch_snapshot_l2()
+            snap = await self._fetch_snapshot_l2()
             if snap:
                 bids = snap.get("bids", [])
                 asks = snap.get("asks", [])
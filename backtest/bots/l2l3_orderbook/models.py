@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
 from typing import Literal
 
+from msgspec import Struct
 
-@dataclass
-class BookState:
+
+class BookState(Struct):
     venue: Literal["binance", "coinbase"]
     symbol: str
     ts_exchange_ms: int | None
@@ -4,6 +4,7 @@ import argparse
 import asyncio
 import datetime as dt
 import logging
+import os
 import sys
 from pathlib import Path
 
@@ -16,6 +17,11 @@ from bots.l2l3_orderbook.exchanges.binance_l2 import BinanceL2BookBuilder
 from bots.l2l3_orderbook.exchanges.coinbase_l3 import CoinbaseL3BookBuilder
 from bots.l2l3_orderbook.storage import StorageSink
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 
 def _session_id() -> str:
     return dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
@@ -28,7 +34,10 @@ async def main_async(args: argparse.Namespace) -> None:
     session_dir.mkdir(parents=True, exist_ok=True)
     logging.info("session_dir=%s", session_dir)
     latest_path = out_root / "LATEST"
-    latest_path.write_text(session)
+    # the dashboard polls LATEST; replace it whole so it never reads a truncated name
+    tmp = latest_path.with_suffix(".tmp")
+    tmp.write_text(session)
+    os.replace(tmp, latest_path)
 
     bus = EventBus()
     stop_evt = asyncio.Event()
@@ -38,7 +47,7 @@ async def main_async(args: argparse.Namespace) -> None:
 
     async def heartbeat() -> None:
         while not stop_evt.is_set():
-            print(f"[l2l3] running... book_states={counts['book']}", flush=True)
+            print(f"[l2l3] running... book_states={counts['book']} dropped={bus.dropped}", flush=True)
             await asyncio.sleep(5)
 
     tasks = [
@@ -50,6 +59,7 @@ async def main_async(args: argparse.Namespace) -> None:
                 top_n=args.top_n,
                 bus=bus,
                 emit_full=args.binance_full_levels,
+                price_scale=args.price_scale,
             ).start(stop_evt)
         ),
     ]
@@ -60,6 +70,7 @@ async def main_async(args: argparse.Namespace) -> None:
                     product_id=args.coinbase_symbol,
                     top_n=args.top_n,
                     bus=bus,
+                    price_scale=args.price_scale,
                 ).start(stop_evt)
             )
         )
@@ -76,6 +87,28 @@ async def main_async(args: argparse.Namespace) -> None:
             t.cancel()
 
 
+def _tune_process(args: argparse.Namespace) -> None:
+    """Optional CPU pinning / priority; each step logs and continues if the OS refuses it."""
+    if args.pin_cpu is not None:
+        try:
+            os.sched_setaffinity(0, {args.pin_cpu})
+            logging.info("pinned to cpu %d", args.pin_cpu)
+        except (AttributeError, OSError) as exc:
+            logging.warning("cpu pinning failed: %s", exc)
+    if args.nice is not None:
+        try:
+            os.nice(args.nice)
+        except OSError as exc:
+            logging.warning("nice(%d) failed: %s", args.nice, exc)
+    if args.fifo_priority is not None:
+        # SCHED_FIFO needs root or CAP_SYS_NICE; the stdlib wraps sched_setscheduler directly
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(args.fifo_priority))
+            logging.info("SCHED_FIFO priority %d", args.fifo_priority)
+        except (AttributeError, OSError) as exc:
+            logging.warning("SCHED_FIFO failed: %s", exc)
+
+
 def main() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", force=True)
     ap = argparse.ArgumentParser()
@@ -86,9 +119,17 @@ def main() -> None:
     ap.add_argument("--window-sec", type=int, default=300)
     ap.add_argument("--binance-full-levels", action="store_true")
     ap.add_argument("--no-coinbase", action="store_true")
+    ap.add_argument("--price-scale", type=int, default=100, help="price levels are keyed as int(price * scale)")
+    ap.add_argument("--pin-cpu", type=int, default=None, help="pin the process to this CPU (Linux)")
+    ap.add_argument("--nice", type=int, default=None, help="nice increment, e.g. -5 (negative needs privileges)")
+    ap.add_argument("--fifo-priority", type=int, default=None, help="run under SCHED_FIFO at this priority (root)")
     args = ap.parse_args()
+    _tune_process(args)
     logging.info("starting l2l3 collector")
-    asyncio.run(main_async(args))
+    if uvloop is not None:
+        uvloop.run(main_async(args))
+    else:
+        asyncio.run(main_async(args))
 
 
 if __name__ == "__main__":
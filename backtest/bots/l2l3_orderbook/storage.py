@@ -1,18 +1,42 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-import pandas as pd
-import time
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from .bus import Event
 from .models import BookState
 
 
+LOG = logging.getLogger(__name__)
+
+_LEVELS = pa.list_(pa.struct([("price", pa.float64()), ("size", pa.float64())]))
+
+BOOK_SCHEMA = pa.schema(
+    [
+        ("ts_ms", pa.int64()),
+        ("ts_exchange_ms", pa.int64()),
+        ("venue", pa.string()),
+        ("symbol", pa.string()),
+        ("kind", pa.string()),
+        ("best_bid", pa.float64()),
+        ("best_ask", pa.float64()),
+        ("bids", _LEVELS),
+        ("asks", _LEVELS),
+        ("l3_order_count", pa.int64()),
+    ]
+)
+
+
 def _bucket_start_ms(ts_ms: int, window_sec: int) -> int:
     step = window_sec * 1000
     return (int(ts_ms) // step) * step
@@ -20,12 +44,19 @@ def _bucket_start_ms(ts_ms: int, window_sec: int) -> int:
 
 @dataclass
 class RollingParquetWriter:
+    """Each flush writes only its new rows as a part file of the open window, so files stay
+    readable while the window is live; on rotation the parts are compacted into one file."""
+
     out_dir: Path
     prefix: str
     window_sec: int = 300
     compression: str = "snappy"
+    schema: pa.Schema | None = None
     _bucket_ms: int | None = None
     _rows: list[dict[str, Any]] = field(default_factory=list)
+    _parts: list[Path] = field(default_factory=list)
+    # (ts_ms, venue) of rows already taken in the open window; the first row for a key wins
+    _seen: set[tuple[int, str]] = field(default_factory=set)
 
     def write(self, row: dict[str, Any]) -> None:
         ts_ms = int(row["ts_ms"])
@@ -33,8 +64,13 @@ class RollingParquetWriter:
         if self._bucket_ms is None:
             self._bucket_ms = bucket_ms
         if bucket_ms != self._bucket_ms:
-            self.flush()
+            self.close()
+            self._seen.clear()
             self._bucket_ms = bucket_ms
+        key = (ts_ms, row.get("venue"))
+        if key in self._seen:
+            return
+        self._seen.add(key)
         self._rows.append(row)
 
     def _path_for_bucket(self, bucket_ms: int) -> Path:
@@ -42,54 +78,119 @@ class RollingParquetWriter:
         name = f"{self.prefix}_{ts.strftime('%Y%m%dT%H%M%SZ')}.parquet"
         return self.out_dir / name
 
+    def _write_atomic(self, table: pa.Table, path: Path) -> None:
+        # readers glob *.parquet, so they never see the .tmp file half-written
+        tmp = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp, compression=self.compression, data_page_version="2.0")
+        os.replace(tmp, path)
+
     def flush(self) -> None:
         if not self._rows:
             return
         self.out_dir.mkdir(parents=True, exist_ok=True)
-        path = self._path_for_bucket(self._bucket_ms or 0)
-        df = pd.DataFrame(self._rows)
-        if path.exists():
+        final = self._path_for_bucket(self._bucket_ms or 0)
+        part = final.with_name(f"{final.stem}.part{len(self._parts):04d}.parquet")
+        # taken before the write: a batch that fails to convert or write is dropped, not
+        # retried (and failed again) by every later flush
+        rows, self._rows = self._rows, []
+        self._write_atomic(pa.Table.from_pylist(rows, schema=self.schema), part)
+        self._parts.append(part)
+
+    def close(self) -> None:
+        """Flush the open window and compact its parts into one file."""
+        self.flush()
+        if not self._parts:
+            return
+        final = self._path_for_bucket(self._bucket_ms or 0)
+        tables = [pq.read_table(p) for p in self._parts]
+        if final.exists():
             try:
-                existing = pd.read_parquet(path)
-                df = pd.concat([existing, df], ignore_index=True)
-                if "ts_ms" in df.columns:
-                    df = df.drop_duplicates(subset=["ts_ms", "venue"]).sort_values("ts_ms")
+                tables.insert(0, pq.read_table(final))
             except Exception:
                 pass
-        df.to_parquet(path, index=False, compression=self.compression)
-        self._rows.clear()
+        self._write_atomic(pa.concat_tables(tables), final)
+        for p in self._parts:
+            p.unlink(missing_ok=True)
+        self._parts.clear()
 
 
 class StorageSink:
-    def __init__(self, out_dir: Path, window_sec: int = 300, flush_sec: float = 5.0) -> None:
-        self._writer = RollingParquetWriter(out_dir, "book_states", window_sec=window_sec)
+    """Consumes book states from the bus; row building and parquet writes run on one worker
+    thread, which is the only code that touches the writer, so batches stay in order."""
+
+    def __init__(
+        self, out_dir: Path, window_sec: int = 300, flush_sec: float = 5.0, batch_rows: int = 5000
+    ) -> None:
+        self._writer = RollingParquetWriter(
+            out_dir, "book_states", window_sec=window_sec, compression="zstd", schema=BOOK_SCHEMA
+        )
+        # pending books are written as soon as batch_rows of them pile up, and otherwise
+        # flush_sec after the previous write. At typical feed rates batch_rows is never reached,
+        # so the cadence is flush_sec with one part file per write; under bursts it is the count.
         self._flush_sec = flush_sec
-        self._last_flush = 0.0
+        self._batch_rows = batch_rows
+        self._last_submit = time.monotonic()
+        self._pending: list[BookState] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="book-storage")
 
     def handle_book(self, book: BookState) -> None:
-        self._writer.write(
-            {
-                "ts_ms": book.ts_local_ms,
-                "ts_exchange_ms": book.ts_exchange_ms,
-                "venue": book.venue,
-                "symbol": book.symbol,
-                "kind": book.kind,
-                "best_bid": book.best_bid,
-                "best_ask": book.best_ask,
-                "bids": json.dumps(book.bids),
-                "asks": json.dumps(book.asks),
-                "l3_order_count": book.l3_order_count,
-            }
-        )
+        self._pending.append(book)
+
+    def handle_books(self, books: list[BookState]) -> None:
+        self._pending.extend(books)
+
+    def _write_books(self, books: list[BookState]) -> None:
+        write = self._writer.write
+        for book in books:
+            write(
+                {
+                    "ts_ms": book.ts_local_ms,
+                    "ts_exchange_ms": book.ts_exchange_ms,
+                    "venue": book.venue,
+                    "symbol": book.symbol,
+                    "kind": book.kind,
+                    "best_bid": book.best_bid,
+                    "best_ask": book.best_ask,
+                    "bids": book.bids,
+                    "asks": book.asks,
+                    "l3_order_count": book.l3_order_count,
+                }
+            )
+        self._writer.flush()
+
+    @staticmethod
+    def _log_failure(fut: Future) -> None:
+        exc = fut.exception()
+        if exc is not None:
+            LOG.error("book storage write failed", exc_info=exc)
+
+    def _submit_pending(self) -> None:
+        self._last_submit = time.monotonic()
+        if self._pending:
+            books, self._pending = self._pending, []
+            self._executor.submit(self._write_books, books).add_done_callback(self._log_failure)
+
+    async def _flush_idle(self) -> None:
+        # a count-triggered write pushes the next timed one back by a full flush_sec
+        while True:
+            await asyncio.sleep(self._last_submit + self._flush_sec - time.monotonic())
+            if time.monotonic() - self._last_submit >= self._flush_sec:
+                self._submit_pending()
 
     async def run(self, bus, stop_evt, counts: dict[str, int] | None = None) -> None:
-        while not stop_evt.is_set():
-            event: Event = await bus.next()
-            if event.type == "book_state":
-                self.handle_book(event.payload)
-                if counts is not None:
-                    counts["book"] = counts.get("book", 0) + 1
-                now = time.time()
-                if now - self._last_flush >= self._flush_sec:
-                    self._writer.flush()
-                    self._last_flush = now
+        timer = asyncio.create_task(self._flush_idle())
+        try:
+            while not stop_evt.is_set():
+                events: list[Event] = await bus.drain(256)
+                books = [event.payload for event in events if event.type == "book_state"]
+                if books:
+                    self.handle_books(books)
+                    if counts is not None:
+                        counts["book"] = counts.get("book", 0) + len(books)
+                    if len(self._pending) >= self._batch_rows:
+                        self._submit_pending()
+        finally:
+            timer.cancel()
+            self._submit_pending()
+            self._executor.submit(self._writer.close).add_done_callback(self._log_failure)
+            self._executor.shutdown(wait=True)
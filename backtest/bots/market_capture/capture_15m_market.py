@@ -3,11 +3,12 @@ import argparse
 import asyncio
 import datetime as dt
 import json
+import multiprocessing
 import re
 import sys
-import urllib.parse
-import urllib.request
 import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -16,22 +17,54 @@ LIBS_DIR = REPO_ROOT / "libs"
 if str(LIBS_DIR) not in sys.path:
     sys.path.insert(0, str(LIBS_DIR))
 
-import pandas as pd
+import aiohttp
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import websockets
 
 from polymarket_utils import ET_TZ, fetch_market_by_slug, normalize_slug, resolve_yes_no_tokens
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 PM_WS = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
 BINANCE_WS = "wss://stream.binance.com:9443/ws"
 BINANCE_REST = "https://api.binance.com/api/v3/klines"
 
+_SAFE_SLUG_RE = re.compile(r"[^A-Za-z0-9_-]+")
+_SLUG_EPOCH_RE = re.compile(r"-([0-9]{10})$")
+
+PM_SCHEMA = pa.schema(
+    [("ts_ms", pa.int64()), ("token_id", pa.string()), ("best_bid", pa.float64()), ("best_ask", pa.float64())]
+)
+BINANCE_SCHEMA = pa.schema([("ts_ms", pa.int64()), ("bid", pa.float64()), ("ask", pa.float64())])
+KLINE_SCHEMA = pa.schema(
+    [
+        ("open_ms", pa.int64()),
+        ("close_ms", pa.int64()),
+        ("volume", pa.float64()),
+        ("quote_volume", pa.float64()),
+        ("trades", pa.int64()),
+    ]
+)
+
 
 def _safe_slug(value: str) -> str:
-    return re.sub(r"[^A-Za-z0-9_-]+", "_", value).strip("_")
+    return _SAFE_SLUG_RE.sub("_", value).strip("_")
 
 
 def _parse_slug_epoch(slug: str) -> int:
-    match = re.search(r"-([0-9]{10})$", slug)
+    match = _SLUG_EPOCH_RE.search(slug)
     if not match:
         raise ValueError("Slug must end with 10-digit epoch seconds.")
     return int(match.group(1))
@@ -46,24 +79,61 @@ def _slug_from_prefix(prefix: str, start_epoch: int) -> str:
 
 
 def _normalize_ts_ms(value) -> int:
-    try:
-        ts = int(float(value))
-    except (TypeError, ValueError):
-        return int(time.time() * 1000)
+    if type(value) is int:
+        ts = value
+    else:
+        try:
+            ts = int(float(value))
+        except (TypeError, ValueError):
+            return int(time.time() * 1000)
     if ts < 1_000_000_000_000:
         return ts * 1000
     if ts > 1_000_000_000_000_000:
-        return int(ts / 1_000_000)
+        return ts // 1_000_000
     return ts
 
 
-def _to_parquet(rows: list[dict], path: Path) -> None:
+def _loop_deadline(end_ms: int) -> float:
+    """Wall-clock end_ms as an event-loop (monotonic) deadline for asyncio.timeout_at."""
+    return asyncio.get_running_loop().time() + (end_ms - int(time.time() * 1000)) / 1000.0
+
+
+def _to_parquet(rows: list[dict], path: Path, schema: pa.Schema) -> None:
+    # explicit schema: no pandas object-dtype inference, and an empty window keeps its columns
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pylist(rows, schema=schema)
+    pq.write_table(table, path, compression="zstd", compression_level=3, row_group_size=65536)
+
+
+def _new_columns(schema: pa.Schema) -> dict[str, array | list]:
+    """Empty capture columns: array.array for int64/float64 fields, a list for the rest."""
+    cols: dict[str, array | list] = {}
+    for field in schema:
+        if field.type == pa.int64():
+            cols[field.name] = array("q")
+        elif field.type == pa.float64():
+            cols[field.name] = array("d")
+        else:
+            cols[field.name] = []
+    return cols
+
+
+def _columns_to_parquet(cols: dict[str, array | list], path: Path, schema: pa.Schema) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    df = pd.DataFrame(rows)
-    df.to_parquet(path, index=False)
+    arrays = []
+    for field in schema:
+        col = cols[field.name]
+        if isinstance(col, array):
+            # zero-copy view of the array's buffer
+            arrays.append(pa.array(np.frombuffer(col, dtype=field.type.to_pandas_dtype())))
+        else:
+            arrays.append(pa.array(col, type=field.type))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+    pq.write_table(table, path, compression="zstd", compression_level=3, row_group_size=65536)
 
 
-def _fetch_binance_klines(
+async def _fetch_binance_klines(
+    http: aiohttp.ClientSession,
     symbol: str,
     interval: str,
     start_ms: int,
@@ -76,10 +146,8 @@ def _fetch_binance_klines(
         "endTime": str(end_ms),
         "limit": "1000",
     }
-    url = BINANCE_REST + "?" + urllib.parse.urlencode(params)
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        data = json.load(resp)
+    async with http.get(BINANCE_REST, params=params) as resp:
+        data = _json_loads(await resp.read())
     if not isinstance(data, list):
         raise RuntimeError(f"Unexpected kline response: {data}")
     rows = []
@@ -98,39 +166,58 @@ def _fetch_binance_klines(
     return rows
 
 
+async def _capture_klines(
+    http: aiohttp.ClientSession,
+    symbol: str,
+    start_ms: int,
+    end_ms: int,
+    path: Path,
+) -> None:
+    """Fetch the window's 1m klines as soon as it ends, while the websocket captures close."""
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(max(0.0, _loop_deadline(end_ms) - loop.time()))
+    try:
+        rows = await _fetch_binance_klines(http, symbol, "1m", start_ms, end_ms)
+        _to_parquet(rows, path, KLINE_SCHEMA)
+        print(f"[OK] saved: {path}")
+    except Exception as exc:
+        print(f"[WARN] binance klines fetch failed: {exc}")
+
+
 async def _capture_polymarket(
     token_ids: list[str],
     start_ms: int,
     end_ms: int,
-    out_rows: list[dict],
+    out_cols: dict[str, array | list],
 ) -> None:
-    while True:
-        now_ms = int(time.time() * 1000)
-        if now_ms >= end_ms:
-            return
+    add_ts = out_cols["ts_ms"].append
+    add_token = out_cols["token_id"].append
+    add_bid = out_cols["best_bid"].append
+    add_ask = out_cols["best_ask"].append
+    # built once and resent as-is on every reconnect; a str goes out as a text frame, which
+    # is what the market channel expects (bytes would be sent as a binary frame)
+    sub_payload = json.dumps({"type": "market", "assets_ids": token_ids, "custom_feature_enabled": True})
+    loop = asyncio.get_running_loop()
+    deadline = _loop_deadline(end_ms)
+    while loop.time() < deadline:
         try:
-            async with websockets.connect(
-                PM_WS, ping_interval=20, ping_timeout=20
+            # one timer for the whole window instead of a wait_for timeout per recv
+            async with asyncio.timeout_at(deadline), websockets.connect(
+                PM_WS,
+                ping_interval=20,
+                ping_timeout=20,
+                open_timeout=5,
+                compression=None,
+                max_size=2**20,
             ) as ws:
-                sub = {
-                    "type": "market",
-                    "assets_ids": token_ids,
-                    "custom_feature_enabled": True,
-                }
-                await ws.send(json.dumps(sub))
+                await ws.send(sub_payload)
                 while True:
-                    now_ms = int(time.time() * 1000)
-                    if now_ms >= end_ms:
-                        return
-                    try:
-                        msg = await asyncio.wait_for(ws.recv(), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        continue
+                    msg = await ws.recv()
                     if msg == "PONG":
                         continue
                     try:
-                        data = json.loads(msg)
-                    except json.JSONDecodeError:
+                        data = _json_loads(msg)
+                    except ValueError:
                         continue
 
                     if isinstance(data, list):
@@ -148,15 +235,14 @@ async def _capture_polymarket(
                         ts_ms = _normalize_ts_ms(event.get("timestamp"))
                         if ts_ms < start_ms or ts_ms > end_ms:
                             continue
-                        out_rows.append(
-                            {
-                                "ts_ms": ts_ms,
-                                "token_id": event.get("asset_id"),
-                                "best_bid": float(event.get("best_bid") or 0.0),
-                                "best_ask": float(event.get("best_ask") or 0.0),
-                            }
-                        )
+                        add_ts(ts_ms)
+                        add_token(event.get("asset_id"))
+                        add_bid(float(event.get("best_bid") or 0.0))
+                        add_ask(float(event.get("best_ask") or 0.0))
         except (websockets.exceptions.ConnectionClosed, OSError) as exc:
+            # TimeoutError is an OSError: past the deadline it is the window ending, not a drop
+            if loop.time() >= deadline:
+                return
             print(f"[WARN] polymarket ws disconnected: {exc}; reconnecting in 2s")
             await asyncio.sleep(2)
 
@@ -165,37 +251,37 @@ async def _capture_binance(
     symbol: str,
     start_ms: int,
     end_ms: int,
-    out_rows: list[dict],
+    out_cols: dict[str, array | list],
 ) -> None:
     url = f"{BINANCE_WS}/{symbol.lower()}@bookTicker"
-    while True:
-        now_ms = int(time.time() * 1000)
-        if now_ms >= end_ms:
-            return
+    add_ts = out_cols["ts_ms"].append
+    add_bid = out_cols["bid"].append
+    add_ask = out_cols["ask"].append
+    loop = asyncio.get_running_loop()
+    deadline = _loop_deadline(end_ms)
+    while loop.time() < deadline:
         try:
-            async with websockets.connect(
-                url, ping_interval=20, ping_timeout=20
+            async with asyncio.timeout_at(deadline), websockets.connect(
+                url,
+                ping_interval=20,
+                ping_timeout=20,
+                open_timeout=5,
+                compression=None,
+                max_size=2**16,
             ) as ws:
                 while True:
-                    now_ms = int(time.time() * 1000)
-                    if now_ms >= end_ms:
-                        return
-                    try:
-                        msg = await asyncio.wait_for(ws.recv(), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        continue
-                    data = json.loads(msg)
+                    msg = await ws.recv()
+                    data = _json_loads(msg)
                     ts_ms = _normalize_ts_ms(data.get("E"))
                     if ts_ms < start_ms or ts_ms > end_ms:
                         continue
-                    out_rows.append(
-                        {
-                            "ts_ms": ts_ms,
-                            "bid": float(data.get("b") or 0.0),
-                            "ask": float(data.get("a") or 0.0),
-                        }
-                    )
+                    add_ts(ts_ms)
+                    add_bid(float(data.get("b") or 0.0))
+                    add_ask(float(data.get("a") or 0.0))
         except (websockets.exceptions.ConnectionClosed, OSError) as exc:
+            # TimeoutError is an OSError: past the deadline it is the window ending, not a drop
+            if loop.time() >= deadline:
+                return
             print(f"[WARN] binance ws disconnected: {exc}; reconnecting in 2s")
             await asyncio.sleep(2)
 
@@ -213,47 +299,46 @@ def _plot(
     import matplotlib.pyplot as plt
     import matplotlib.ticker as mtick
 
-    pm_df = pd.read_parquet(pm_path)
-    bin_df = pd.read_parquet(binance_path)
-    kline_df = pd.DataFrame()
+    # plain numpy columns: derived series and masks are array ops, no Series/frame per step
+    pm = pq.read_table(pm_path)
+    bn = pq.read_table(binance_path)
+    kl = None
     if kline_path is not None and kline_path.exists():
-        kline_df = pd.read_parquet(kline_path)
-
-    if not pm_df.empty:
-        pm_df["t_sec"] = (pm_df["ts_ms"] - start_ms) / 1000.0
-    if not bin_df.empty:
-        bin_df["t_sec"] = (bin_df["ts_ms"] - start_ms) / 1000.0
-        bin_df["mid"] = (bin_df["bid"] + bin_df["ask"]) / 2.0
-    if not kline_df.empty:
-        kline_df["t_sec"] = (kline_df["open_ms"] - start_ms) / 1000.0
-        kline_df["width_sec"] = (kline_df["close_ms"] - kline_df["open_ms"]) / 1000.0
+        kl = pq.read_table(kline_path)
 
     fig, axes = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
     ax_pm, ax_bn = axes
 
-    if not pm_df.empty:
-        yes = pm_df[pm_df["token_id"] == yes_token_id]
-        no = pm_df[pm_df["token_id"] == no_token_id]
-        ax_pm.plot(yes["t_sec"], yes["best_bid"], label="YES bid", color="#1f77b4")
-        ax_pm.plot(yes["t_sec"], yes["best_ask"], label="YES ask", color="#ff7f0e")
-        ax_pm.plot(no["t_sec"], no["best_bid"], label="NO bid", color="#2ca02c")
-        ax_pm.plot(no["t_sec"], no["best_ask"], label="NO ask", color="#d62728")
+    if pm.num_rows:
+        pm_t = (pm["ts_ms"].to_numpy() - start_ms) * 1e-3
+        pm_token = pm["token_id"].to_numpy(zero_copy_only=False)
+        pm_bid = pm["best_bid"].to_numpy()
+        pm_ask = pm["best_ask"].to_numpy()
+        yes = pm_token == yes_token_id
+        no = pm_token == no_token_id
+        ax_pm.plot(pm_t[yes], pm_bid[yes], label="YES bid", color="#1f77b4")
+        ax_pm.plot(pm_t[yes], pm_ask[yes], label="YES ask", color="#ff7f0e")
+        ax_pm.plot(pm_t[no], pm_bid[no], label="NO bid", color="#2ca02c")
+        ax_pm.plot(pm_t[no], pm_ask[no], label="NO ask", color="#d62728")
     ax_pm.set_title(f"Polymarket 15m orderbook: {slug}")
     ax_pm.set_ylabel("price")
     ax_pm.legend(loc="upper left")
     ax_pm.grid(True, alpha=0.2)
 
     ax_vol = None
-    if not bin_df.empty:
-        ax_bn.plot(bin_df["t_sec"], bin_df["mid"], label="Binance mid", color="#111827")
-        open_price = float(bin_df.iloc[0]["mid"])
+    if bn.num_rows:
+        bn_t = (bn["ts_ms"].to_numpy() - start_ms) * 1e-3
+        bn_mid = (bn["bid"].to_numpy() + bn["ask"].to_numpy()) * 0.5
+        ax_bn.plot(bn_t, bn_mid, label="Binance mid", color="#111827")
+        open_price = float(bn_mid[0])
         ax_bn.axhline(open_price, linestyle="--", color="#6b7280", label="15m open")
-    if not kline_df.empty:
+    if kl is not None and kl.num_rows:
+        kl_open = kl["open_ms"].to_numpy()
         ax_vol = ax_bn.twinx()
-        width = float(kline_df["width_sec"].median()) if "width_sec" in kline_df else 60.0
+        width = float(np.median(kl["close_ms"].to_numpy() - kl_open)) * 1e-3
         ax_vol.bar(
-            kline_df["t_sec"],
-            kline_df["volume"],
+            (kl_open - start_ms) * 1e-3,
+            kl["volume"].to_numpy(),
             width=width * 0.8,
             alpha=0.25,
             color="#9ca3af",
@@ -289,6 +374,11 @@ def _plot(
     print(f"[OK] saved plot: {out_png}")
 
 
+def _log_plot_result(fut: asyncio.Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        print(f"[WARN] plot failed: {fut.exception()}")
+
+
 def parse_args() -> argparse.Namespace:
     ap = argparse.ArgumentParser()
     ap.add_argument("--slug", default=None, help="Polymarket slug (15m)")
@@ -325,6 +415,8 @@ def parse_args() -> argparse.Namespace:
 
 
 async def _capture_window(
+    http: aiohttp.ClientSession,
+    plot_pool: ProcessPoolExecutor,
     slug: str,
     binance_symbol: str,
     out_dir: Path,
@@ -356,14 +448,8 @@ async def _capture_window(
     tokens = resolve_yes_no_tokens(market, slug)
     token_ids = [tokens.yes_token_id, tokens.no_token_id]
 
-    pm_rows: list[dict] = []
-    bn_rows: list[dict] = []
-
-    print(f"[BOOT] slug={tokens.slug} start_ms={start_ms} end_ms={end_ms}")
-    await asyncio.gather(
-        _capture_polymarket(token_ids, start_ms, end_ms, pm_rows),
-        _capture_binance(binance_symbol, start_ms, end_ms, bn_rows),
-    )
+    pm_cols = _new_columns(PM_SCHEMA)
+    bn_cols = _new_columns(BINANCE_SCHEMA)
 
     safe = _safe_slug(tokens.slug)
     pm_path = out_dir / f"{safe}_polymarket.parquet"
@@ -372,14 +458,15 @@ async def _capture_window(
     plot_path = out_dir / f"{safe}_plot.png"
     kline_path = out_dir / f"{safe}_binance_klines.parquet"
 
-    _to_parquet(pm_rows, pm_path)
-    _to_parquet(bn_rows, bn_path)
-    try:
-        kline_rows = _fetch_binance_klines(binance_symbol, "1m", start_ms, end_ms)
-        _to_parquet(kline_rows, kline_path)
-        print(f"[OK] saved: {kline_path}")
-    except Exception as exc:
-        print(f"[WARN] binance klines fetch failed: {exc}")
+    print(f"[BOOT] slug={tokens.slug} start_ms={start_ms} end_ms={end_ms}")
+    await asyncio.gather(
+        _capture_polymarket(token_ids, start_ms, end_ms, pm_cols),
+        _capture_binance(binance_symbol, start_ms, end_ms, bn_cols),
+        _capture_klines(http, binance_symbol, start_ms, end_ms, kline_path),
+    )
+
+    _columns_to_parquet(pm_cols, pm_path, PM_SCHEMA)
+    _columns_to_parquet(bn_cols, bn_path, BINANCE_SCHEMA)
     meta = {
         "slug": tokens.slug,
         "yes_token_id": tokens.yes_token_id,
@@ -394,7 +481,10 @@ async def _capture_window(
     print(f"[OK] saved: {bn_path}")
     print(f"[OK] saved: {meta_path}")
 
-    _plot(
+    # rendered in a child process so --follow can start the next window right away
+    fut = asyncio.get_running_loop().run_in_executor(
+        plot_pool,
+        _plot,
         pm_path,
         bn_path,
         kline_path if kline_path.exists() else None,
@@ -404,6 +494,7 @@ async def _capture_window(
         tokens.yes_token_id,
         tokens.no_token_id,
     )
+    fut.add_done_callback(_log_plot_result)
     return True
 
 
@@ -414,6 +505,25 @@ async def main_async() -> None:
     if not args.slug and not args.auto_15m_prefix:
         raise RuntimeError("Provide --slug or --auto-15m-prefix.")
 
+    # one pooled session for the whole run, so --follow reuses the Binance REST connection
+    # leaving the plot pool waits for the last window's plot. The worker starts with the first
+    # plot, by which time resolver/executor threads exist, so it is spawned rather than forked.
+    connector = aiohttp.TCPConnector(ttl_dns_cache=300, keepalive_timeout=60)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as plot_pool:
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=10),
+            headers={"User-Agent": "Mozilla/5.0"},
+        ) as http:
+            await _run_windows(http, plot_pool, args, out_dir)
+
+
+async def _run_windows(
+    http: aiohttp.ClientSession,
+    plot_pool: ProcessPoolExecutor,
+    args: argparse.Namespace,
+    out_dir: Path,
+) -> None:
     if args.auto_15m_prefix:
         windows = 0
         if args.start_epoch is not None:
@@ -427,6 +537,8 @@ async def main_async() -> None:
         while True:
             slug = _slug_from_prefix(args.auto_15m_prefix, start_epoch)
             captured = await _capture_window(
+                http,
+                plot_pool,
                 slug,
                 args.binance_symbol,
                 out_dir,
@@ -440,11 +552,14 @@ async def main_async() -> None:
                 return
             start_epoch += 900
     else:
-        await _capture_window(args.slug, args.binance_symbol, out_dir)
+        await _capture_window(http, plot_pool, args.slug, args.binance_symbol, out_dir)
 
 
 def main() -> None:
-    asyncio.run(main_async())
+    if uvloop is not None:
+        uvloop.run(main_async())
+    else:
+        asyncio.run(main_async())
 
 
 if __name__ == "__main__":